@@ -0,0 +1,158 @@
+# backend/analytics.py
+"""Spending rollups for the analytics endpoint.
+
+Single-range breakdowns are pushed down to MongoDB as one ``$facet``
+pipeline. Comparing several ranges at once loads the (timestamp, amount,
+category) columns a single time and slices them in process, with NumPy when
+it is installed. Results are cached per user and dropped on every expense
+or budget write.
+"""
+from bisect import bisect_left
+from itertools import accumulate
+
+from backend.cache import LRUCache
+from backend.config import Config
+from backend import purge, repository
+from backend.models import DEFAULT_CATEGORY, ExpenseBatch, epoch
+
+GRANULARITY_FORMATS = {
+    "day": "%Y-%m-%d",
+    "week": "%G-W%V",
+    "month": "%Y-%m",
+}
+
+# email -> LRUCache of query key -> result; the TTL bounds staleness across workers
+_cache = LRUCache(Config.ANALYTICS_CACHE_SIZE, ttl=Config.ANALYTICS_CACHE_TTL)
+
+
+def _numpy():
+    # Imported on first use so app startup does not pay for it
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def invalidate(email):
+    """Forget every cached result for ``email``. Called on expense/budget writes."""
+    _cache.pop(email)
+
+
+def cached(email, key, compute):
+    results = _cache.get(email)
+    if results is None:
+        # Bounded too, or one user looping over query strings grows it forever
+        results = LRUCache(Config.ANALYTICS_CACHE_KEYS)
+        _cache.set(email, results)
+    else:
+        result = results.get(key)
+        if result is not None:
+            return result
+    result = compute()
+    results.set(key, result)
+    return result
+
+
+def cache_stats():
+    return _cache.stats()
+
+
+def summarize(email, start=None, end=None, granularity="day", top=10):
+    """Totals, per-category, per-period and top-description spend in one pass."""
+    repo, generation = repository.for_user(email)
+    pipeline = [
+        {"$facet": {
+            "totals": [
+                {"$group": {"_id": None, "total": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+            ],
+            "by_category": [
+                {"$group": {
+                    "_id": {"$ifNull": ["$category", DEFAULT_CATEGORY]},
+                    "total": {"$sum": "$amount"},
+                    "count": {"$sum": 1},
+                }},
+                {"$sort": {"total": -1}},
+            ],
+            "by_period": [
+                {"$group": {
+                    "_id": {"$dateToString": {"format": GRANULARITY_FORMATS[granularity], "date": "$created_at"}},
+                    "total": {"$sum": "$amount"},
+                    "count": {"$sum": 1},
+                }},
+                {"$sort": {"_id": 1}},
+            ],
+            "top_descriptions": [
+                {"$group": {"_id": "$description", "total": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+                {"$sort": {"total": -1}},
+                {"$limit": top},
+            ],
+        }},
+    ]
+    facets = next(repo.aggregate(purge.live(email, generation), pipeline, start, end))
+    totals = facets["totals"][0] if facets["totals"] else {"total": 0, "count": 0}
+
+    def rows(key, name):
+        return [{name: row["_id"], "total": row["total"], "count": row["count"]} for row in facets[key]]
+
+    return {
+        "total": totals["total"],
+        "count": totals["count"],
+        "by_category": rows("by_category", "category"),
+        "by_period": rows("by_period", "period"),
+        "top_descriptions": rows("top_descriptions", "description"),
+    }
+
+
+def _load_columns(email, start, end):
+    repo, generation = repository.for_user(email)
+    cursor = repo.find(purge.live(email, generation), ("created_at", "amount", "category"), start, end,
+                       batch_size=5000)
+    return ExpenseBatch.from_docs(cursor, email)
+
+
+def compare_ranges(email, ranges):
+    """Totals and per-category spend for each ``(start, end)`` range.
+
+    The union of the ranges is read once; every range is then answered from
+    prefix sums over the sorted columns.
+    """
+    lower = min(start for start, _ in ranges)
+    upper = max(end for _, end in ranges)
+    batch = _load_columns(email, lower, upper)
+    timestamps, amounts, codes, names = batch.timestamps, batch.amounts, batch.codes, batch.categories
+
+    results = []
+    np = _numpy()
+    if np is not None:
+        # The batch's arrays are plain C buffers; NumPy wraps them without copying
+        ts = np.frombuffer(timestamps, dtype=np.float64)
+        values = np.frombuffer(amounts, dtype=np.float64)
+        code_array = np.frombuffer(codes, dtype=np.uint32)
+        prefix = np.concatenate(([0.0], np.cumsum(values)))
+        for start, end in ranges:
+            lo, hi = np.searchsorted(ts, [epoch(start), epoch(end)], side="left")
+            per_category = np.bincount(code_array[lo:hi], weights=values[lo:hi], minlength=len(names))
+            results.append(_range_result(start, end, float(prefix[hi] - prefix[lo]), int(hi - lo),
+                                         names, per_category.tolist()))
+        return results
+
+    prefix = [0.0, *accumulate(amounts)]
+    for start, end in ranges:
+        lo = bisect_left(timestamps, epoch(start))
+        hi = bisect_left(timestamps, epoch(end))
+        per_category = [0.0] * len(names)
+        for i in range(lo, hi):
+            per_category[codes[i]] += amounts[i]
+        results.append(_range_result(start, end, prefix[hi] - prefix[lo], hi - lo, names, per_category))
+    return results
+
+
+def _range_result(start, end, total, count, names, per_category):
+    return {
+        "start": start,
+        "end": end,
+        "total": total,
+        "count": count,
+        "by_category": {name: value for name, value in sorted(zip(names, per_category)) if value},
+    }
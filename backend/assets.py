@@ -0,0 +1,171 @@
+# backend/assets.py
+"""The frontend, loaded into memory and served precompressed.
+
+Every file under ``frontend/`` is read once at startup. Text assets get a
+gzip variant, and a brotli one when the ``brotli`` package is installed;
+a variant is kept only if it is smaller than the original. Each file also
+gets a strong ETag from a hash of its content. That hash is the file's
+fingerprint too: ``name.<hash>.ext`` serves the same bytes with an
+immutable one-year cache lifetime, so a page that links through
+``AssetStore.url_for`` never has to revalidate its scripts and styles. Plain names,
+including the HTML pages, are revalidated on every use and answered with a
+304 when they have not changed.
+
+In development ``start_watcher`` polls the directory and reloads it when a
+file changes.
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import threading
+import time
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # Optional: pip install brotli
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Never served, even though they sit in frontend/
+IGNORED_EXTENSIONS = {".py", ".pyc"}
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+FINGERPRINT_LENGTH = 12
+
+
+class Asset:
+    """One file's bytes and their precompressed variants."""
+
+    __slots__ = ("name", "content_type", "body", "fingerprint", "variants")
+
+    def __init__(self, name, body):
+        self.name = name
+        self.content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        self.body = body
+        self.fingerprint = hashlib.sha256(body).hexdigest()[:FINGERPRINT_LENGTH]
+        self.variants = {}
+        if self.content_type.startswith(COMPRESSIBLE_TYPES):
+            if brotli is not None:
+                self._add_variant("br", brotli.compress(body, quality=11))
+            self._add_variant("gzip", gzip.compress(body, compresslevel=9, mtime=0))
+
+    def _add_variant(self, encoding, data):
+        if len(data) < len(self.body):
+            self.variants[encoding] = data
+
+    @property
+    def fingerprinted_name(self):
+        root, ext = os.path.splitext(self.name)
+        return f"{root}.{self.fingerprint}{ext}"
+
+    def etag(self, encoding=None):
+        # Each encoding is a different byte sequence, so a strong tag per encoding
+        return f"{self.fingerprint}-{encoding}" if encoding else self.fingerprint
+
+
+class AssetStore:
+    """All the files under ``root`` by name and by fingerprinted name."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    def _paths(self):
+        for directory, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if not d.startswith((".", "_"))]
+            for filename in filenames:
+                if filename.startswith(".") or os.path.splitext(filename)[1] in IGNORED_EXTENSIONS:
+                    continue
+                yield os.path.join(directory, filename)
+
+    def signature(self):
+        """Cheap summary of the files on disk; changes whenever one does."""
+        result = []
+        for path in self._paths():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            result.append((path, stat.st_mtime_ns, stat.st_size))
+        return sorted(result)
+
+    def load(self):
+        assets = {}
+        for path in self._paths():
+            name = os.path.relpath(path, self.root).replace(os.sep, "/")
+            with open(path, "rb") as f:
+                asset = Asset(name, f.read())
+            assets[name] = (asset, False)
+            assets[asset.fingerprinted_name] = (asset, True)
+        # Readers see either the old set or the new one, never a mix
+        with self._lock:
+            self._assets = assets
+        return len(assets) // 2
+
+    def get(self, name):
+        """``(asset, fingerprinted)`` for ``name``, or ``(None, False)``."""
+        return self._assets.get(name, (None, False))
+
+    def url_for(self, name):
+        asset, _ = self.get(name)
+        if asset is None:
+            raise KeyError(name)
+        return "/" + asset.fingerprinted_name
+
+
+def _negotiate(asset):
+    """The best encoding the client accepts among the ones we have, or None."""
+    best, best_quality = None, 0
+    for encoding in ("br", "gzip"):
+        if encoding in asset.variants:
+            quality = request.accept_encodings[encoding]
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+    return best
+
+
+def send_asset(asset, fingerprinted):
+    encoding = _negotiate(asset)
+    etag = asset.etag(encoding)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(asset.variants[encoding] if encoding else asset.body, mimetype=asset.content_type)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if fingerprinted else REVALIDATE_CACHE_CONTROL
+    if asset.variants:
+        response.vary.add("Accept-Encoding")
+    return response
+
+
+def start_watcher(store, interval):
+    """Reload ``store`` from a daemon thread whenever its files change."""
+
+    def watch():
+        signature = store.signature()
+        while True:
+            time.sleep(interval)
+            current = store.signature()
+            if current == signature:
+                continue
+            try:
+                count = store.load()
+            except OSError as e:
+                # Caught mid-save; try again on the next poll
+                logger.warning("Could not reload frontend assets: %s", e)
+                continue
+            signature = current
+            logger.info("Reloaded %d frontend assets", count)
+
+    thread = threading.Thread(target=watch, name="asset-watcher", daemon=True)
+    thread.start()
+    return thread
@@ -1,13 +1,25 @@
 import jwt
 import os
-from flask import Blueprint, request, jsonify, session
-from werkzeug.security import generate_password_hash, check_password_hash
+import hashlib
+import logging
+from functools import wraps
+from flask import Blueprint, request, jsonify, session, g
 from datetime import datetime, timezone, timedelta
+from pymongo.errors import PyMongoError
 from .database import users_collection
+from .models import UserModel
+from . import passwords
+from .cache import LRUCache
+from .config import Config
 
 auth_bp = Blueprint("auth", __name__)
+logger = logging.getLogger(__name__)
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your_secret_key")
+BEARER_PREFIX = "Bearer "
+
+# Verified claims keyed by token digest; each entry lives until the token's exp
+token_cache = LRUCache(Config.TOKEN_CACHE_SIZE, ttl=Config.JWT_ACCESS_TOKEN_EXPIRES)
 
 class AuthError(Exception):
     """Custom exception class for authentication errors."""
@@ -23,27 +35,33 @@ def register():
     if users_collection.find_one({"email": data["email"]}):
         return jsonify({"error": "User already exists"}), 400
 
-    hashed_password = generate_password_hash(data["password"])
-    user = {
-        "username": data["username"],
-        "email": data["email"],
-        "password": hashed_password,
-    }
-    users_collection.insert_one(user)
+    try:
+        hashed_password = passwords.hash_password(data["password"])
+    except passwords.HashingBusy:
+        return busy()
+    user = UserModel(data["username"], data["email"], hashed_password)
+    users_collection.insert_one(user.to_doc())
     
     return jsonify({"message": "User registered successfully"}), 201
 
 @auth_bp.route("/login", methods=["POST"])
 def login():
     data = request.get_json()
-    user = users_collection.find_one({"email": data["email"]})
+    doc = users_collection.find_one({"email": data["email"]})
+    user = UserModel.from_doc(doc) if doc else None
 
-    if not user or not check_password_hash(user["password"], data["password"]):
+    try:
+        valid = user is not None and passwords.verify_password(user.password, data["password"])
+    except passwords.HashingBusy:
+        return busy()
+    if not valid:
         return jsonify({"status": "error", "message": "Invalid credentials"}), 401
+    if passwords.needs_rehash(user.password):
+        rehash_password(user, data["password"])
 
     # Generate JWT
     token = jwt.encode(
-        {"user_id": str(user["_id"]), "email": user["email"], "exp": datetime.now(timezone.utc) + timedelta(hours=1)},
+        {"user_id": str(user.id), "email": user.email, "exp": datetime.now(timezone.utc) + timedelta(hours=1)},
         SECRET_KEY,
         algorithm="HS256",
     )
@@ -51,14 +69,59 @@ def login():
         "status": "success",
         "message": "Login successful!",
         "token": token,
-        "email": user["email"],
+        "email": user.email,
         "redirect": "/dashboard"
     })
 
+def busy():
+    """503 for when the hashing pool is saturated; the client should retry shortly."""
+    response = jsonify({"status": "error", "message": "Server busy, please retry"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+def rehash_password(user, password):
+    """Upgrade a stored hash to the configured method. Best effort: login proceeds regardless."""
+    try:
+        users_collection.update_one(
+            {"_id": user.id, "password": user.password},
+            {"$set": {"password": passwords.hash_password(password)}}
+        )
+    except (passwords.HashingBusy, PyMongoError) as e:
+        logger.warning("Could not rehash password for %s: %s", user.email, e)
+
 def decode_jwt(token):
     try:
         return jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
     except jwt.ExpiredSignatureError:
         raise AuthError("Token has expired", 401)
     except jwt.InvalidTokenError:
-        raise AuthError("Invalid token", 403)
\ No newline at end of file
+        raise AuthError("Invalid token", 403)
+
+def verify_token(token):
+    """Return the token's claims, skipping the signature check for tokens seen before."""
+    digest = hashlib.sha256(token.encode()).digest()
+    claims = token_cache.get(digest)
+    if claims is None:
+        claims = decode_jwt(token)
+        token_cache.set(digest, claims, expires_at=claims.get("exp"))
+    return claims
+
+def require_auth(view):
+    """Reject requests without a valid bearer token.
+
+    The verified claims are available as ``g.jwt_claims`` and the caller's
+    email as ``g.user_email``.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        header = request.headers.get("Authorization", "")
+        if not header.startswith(BEARER_PREFIX):
+            return jsonify({"message": "Unauthorized", "status": "error"}), 401
+        try:
+            claims = verify_token(header[len(BEARER_PREFIX):])
+        except AuthError:
+            return jsonify({"message": "Unauthorized", "status": "error"}), 401
+        g.jwt_claims = claims
+        g.user_email = claims["email"]
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,100 @@
+# backend/budget_cache.py
+"""Read-through cache of each user's active budget.
+
+Entries live at most ``BUDGET_CACHE_TTL`` seconds, which bounds how stale a
+worker can be even if an invalidation never reaches it. Budget routes and
+resets call ``invalidate`` after they write, which drops the entry here and,
+through the configured channel (see ``backend.invalidation``), in every
+other worker. Expense writes only move the counters: adds leave the entry
+alone and deletes just ``forget`` the local one. Callers that need the
+counters fresh pass the current data version as ``min_version`` and never
+get an older entry.
+"""
+import threading
+
+from backend import metrics
+from backend.cache import LRUCache
+from backend.config import Config
+from backend.database import budgets_collection
+from backend.invalidation import get_channel
+from backend.models import BudgetModel
+
+TOPIC = "budgets"
+# Cached for users without an active budget, so repeat checks skip the query too
+NO_BUDGET = object()
+
+_cache = LRUCache(Config.BUDGET_CACHE_SIZE, ttl=Config.BUDGET_CACHE_TTL)
+# Counted here: the LRU's own counters would call an entry too old for min_version a hit
+lookups = metrics.Counter("budget_cache_lookups_total", "Active-budget cache lookups, by result", ("result",))
+# Bumped on every drop; a read that raced one does not store what it read
+_drops = 0
+_drops_lock = threading.Lock()
+_subscribed = False
+
+
+def _forget(key):
+    global _drops
+    with _drops_lock:
+        _drops += 1
+    if key is None:
+        _cache.clear()
+    else:
+        _cache.pop(key)
+
+
+def _channel():
+    global _subscribed
+    channel = get_channel()
+    if not _subscribed:
+        with _drops_lock:
+            if not _subscribed:
+                channel.subscribe(TOPIC, _forget)
+                _subscribed = True
+    return channel
+
+
+def get(email, min_version=None):
+    """The user's active ``BudgetModel``, or ``None`` if they have none."""
+    _channel()
+    entry = _cache.get(email)
+    if entry is not None and (min_version is None or (entry is not NO_BUDGET and entry.version >= min_version)):
+        lookups.inc("hit")
+        return None if entry is NO_BUDGET else entry
+
+    lookups.inc("miss")
+    drops = _drops
+    # Imported here: ledger builds on this module
+    from backend.ledger import seed
+
+    doc = seed(budgets_collection.find_one({"email": email, "is_active": True}))
+    entry = BudgetModel.from_doc(doc) if doc else NO_BUDGET
+    with _drops_lock:
+        if drops == _drops:
+            _cache.set(email, entry)
+    return None if entry is NO_BUDGET else entry
+
+
+def forget(email):
+    """Drop this worker's entry after a write only this worker needs to see."""
+    _forget(email)
+
+
+def invalidate(email):
+    """Drop the entry in every worker after the budget itself changed."""
+    _channel().publish(TOPIC, email)
+
+
+def stats():
+    counts = lookups.values()
+    hits, misses = counts.get(("hit",), 0), counts.get(("miss",), 0)
+    return {
+        "size": len(_cache),
+        "maxsize": _cache.maxsize,
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+    }
+
+
+metrics.Gauge("budget_cache_hit_ratio", "Share of active-budget lookups answered from the cache",
+              lambda: stats()["hit_ratio"])
@@ -0,0 +1,96 @@
+# backend/conditional.py
+"""Conditional GETs keyed on the per-user data version.
+
+A read's ETag is the user's data version (see ``ledger.touch``) plus a
+digest of the request's path and query string, so every page, projection
+and format gets its own tag. The UTC date is in the digest too: budget
+periods roll over at midnight UTC without any write. When ``If-None-Match`` carries the current tag
+the view is skipped and a 304 goes back after a single indexed lookup.
+"""
+import hashlib
+import threading
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import g, make_response, request
+
+from backend import ledger, metrics
+
+# Browsers may keep the response but must revalidate it on every use
+CACHE_CONTROL = "private, no-cache"
+
+
+class ConditionalStats:
+    """Per-endpoint counts of conditional reads and how many ended in a 304."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, conditional, not_modified):
+        with self._lock:
+            counts = self._endpoints.setdefault(endpoint, {"requests": 0, "conditional": 0, "not_modified": 0})
+            counts["requests"] += 1
+            counts["conditional"] += conditional
+            counts["not_modified"] += not_modified
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                endpoint: dict(counts, hit_ratio=counts["not_modified"] / counts["requests"])
+                for endpoint, counts in self._endpoints.items()
+            }
+
+
+stats = ConditionalStats()
+
+
+def _counts(key):
+    return {(endpoint,): counts[key] for endpoint, counts in stats.snapshot().items()}
+
+
+metrics.Gauge("conditional_get_requests_total", "Reads that support conditional GET, by endpoint",
+              lambda: _counts("requests"), ("endpoint",), kind="counter")
+metrics.Gauge("conditional_get_not_modified_total", "Conditional reads answered with 304, by endpoint",
+              lambda: _counts("not_modified"), ("endpoint",), kind="counter")
+
+
+def etag_for(version, email):
+    today = datetime.now(timezone.utc).date()
+    digest = hashlib.sha1(f"{email}\0{today}\0{request.full_path}".encode()).hexdigest()[:16]
+    return f"{version}-{digest}"
+
+
+def conditional(view):
+    """Answer ``If-None-Match`` for a per-user read without running ``view``.
+
+    Goes under ``require_auth``. The version is read before the view runs,
+    so a write that lands in between can only make the tag older than the
+    body, which costs one extra full response later, never a stale 304.
+    """
+    @wraps(view)
+    def wrapper(email, *args, **kwargs):
+        if g.user_email != email:
+            return view(email, *args, **kwargs)
+
+        version = ledger.data_version(email)
+        if version is None:
+            # No budget document means no version to key on; always serve fresh
+            return view(email, *args, **kwargs)
+
+        # Views can check cached data against it (see budget_cache.get)
+        g.data_version = version
+        etag = etag_for(version, email)
+        conditional_request = bool(request.if_none_match)
+        if request.if_none_match.contains_weak(etag):
+            stats.record(request.endpoint, True, True)
+            response = make_response("", 304)
+        else:
+            stats.record(request.endpoint, conditional_request, False)
+            response = make_response(view(email, *args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag, weak=True)
+        response.headers["Cache-Control"] = CACHE_CONTROL
+        return response
+    return wrapper
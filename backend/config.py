@@ -14,14 +14,121 @@ class Config:
     MONGO_CLUSTER = os.getenv("MONGO_CLUSTER")
     MONGO_DB = os.getenv("MONGO_DB", "expense_tracker")
 
-    MONGO_URI = (
+    # MONGO_URI wins when set (e.g. mongodb://localhost:27017 for local runs)
+    MONGO_URI = os.getenv("MONGO_URI") or (
         f"mongodb+srv://{MONGO_USER}:{MONGO_PASSWORD}@{MONGO_CLUSTER}/{MONGO_DB}"
         "?retryWrites=true&w=majority"
+        if all([MONGO_USER, MONGO_PASSWORD, MONGO_CLUSTER]) else None
     )
 
+    # Connection pool (one client per process, see backend/database.py)
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 2000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+    # Tried in order; ones whose client package is missing are skipped
+    MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib")
+    MONGO_WRITE_CONCERN = os.getenv("MONGO_WRITE_CONCERN", "majority")
+    MONGO_READ_CONCERN = os.getenv("MONGO_READ_CONCERN")
+
+    # Index management (see backend/indexes.py)
+    ENSURE_INDEXES_ON_STARTUP = os.getenv("ENSURE_INDEXES_ON_STARTUP", "True").lower() == "true"
+    CHECK_QUERY_PLANS_ON_STARTUP = os.getenv("CHECK_QUERY_PLANS_ON_STARTUP", "False").lower() == "true"
+
+    # Observability (see backend/metrics.py); commands slower than this are
+    # logged with their filter shape, -1 turns the log off
+    SLOW_QUERY_MS = int(os.getenv("SLOW_QUERY_MS", 100))
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+
+    # Frontend assets (see backend/assets.py); the watcher reloads them from
+    # disk when a file changes, meant for development
+    ASSET_WATCH = os.getenv("ASSET_WATCH", os.getenv("FLASK_DEBUG", "False")).lower() in ("true", "1")
+    ASSET_WATCH_INTERVAL = float(os.getenv("ASSET_WATCH_INTERVAL", 1))
+
     # JWT
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
     JWT_ACCESS_TOKEN_EXPIRES = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRES", 3600))
+    # Verified tokens kept in memory so repeat requests skip the HS256 check
+    TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+
+    # Password hashing (see backend/passwords.py); stored hashes made with an
+    # older method or cost are upgraded on the next successful login
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    # Worker processes for hashing; 0 hashes inline on the request thread
+    PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", os.cpu_count() or 1))
+    # Jobs queued or running before new ones are rejected with 503
+    PASSWORD_POOL_MAX_PENDING = int(os.getenv("PASSWORD_POOL_MAX_PENDING", 4 * (os.cpu_count() or 1)))
+    PASSWORD_POOL_TIMEOUT = int(os.getenv("PASSWORD_POOL_TIMEOUT", 10))
+
+    # Server-side sessions (see backend/sessions.py)
+    # "memory" (single process, LRU) or "mongo" (shared by workers, TTL index)
+    SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+    SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", 10000))
+    SESSION_TTL = int(os.getenv("SESSION_TTL", 24 * 3600))
+    # JWT-only paths that never load or save a session
+    SESSION_SKIP_PREFIXES = os.getenv("SESSION_SKIP_PREFIXES", "/api/,/ws")
+
+    # Active budget cache (see backend/budget_cache.py); the TTL is the longest a
+    # worker can serve a budget another worker changed
+    BUDGET_CACHE_SIZE = int(os.getenv("BUDGET_CACHE_SIZE", 10000))
+    BUDGET_CACHE_TTL = int(os.getenv("BUDGET_CACHE_TTL", 5))
+    # Each user's expense layout and live generation (see backend/repository.py)
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 5))
+    # "memory" (single process) or "mongo" (capped collection tailed by every worker)
+    CACHE_INVALIDATION = os.getenv("CACHE_INVALIDATION", "memory")
+    CACHE_INVALIDATION_CAP_BYTES = int(os.getenv("CACHE_INVALIDATION_CAP_BYTES", 1024 * 1024))
+
+    # Analytics result cache (per user, dropped on every write)
+    ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", 1000))
+    ANALYTICS_CACHE_TTL = int(os.getenv("ANALYTICS_CACHE_TTL", 300))
+    # Distinct queries cached per user, least recently used dropped first
+    ANALYTICS_CACHE_KEYS = int(os.getenv("ANALYTICS_CACHE_KEYS", 32))
 
     # WebSocket
+    # "memory" (single process) or "mongo" (change stream, fans out across workers)
+    EVENT_BROKER = os.getenv("EVENT_BROKER", "memory")
+    EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", 256))
+    EVENT_RETENTION_SECONDS = int(os.getenv("EVENT_RETENTION_SECONDS", 3600))
+    WS_MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", 1000))
+    WS_PING_INTERVAL = int(os.getenv("WS_PING_INTERVAL", 25))
+    WS_IDLE_TIMEOUT = int(os.getenv("WS_IDLE_TIMEOUT", 1800))
+    WS_SYNC_BATCH_SIZE = int(os.getenv("WS_SYNC_BATCH_SIZE", 500))
+    # Longest an expense can take from its created_at stamp to being stored; the
+    # sync watermark stays this far behind, so late inserts are not skipped
+    WS_SYNC_SETTLE_SECONDS = int(os.getenv("WS_SYNC_SETTLE_SECONDS", 60))
+    # Frames at least this large are deflated for clients that ask for it
+    WS_COMPRESS_THRESHOLD = int(os.getenv("WS_COMPRESS_THRESHOLD", 4096))
+    # Deletions are remembered this long so reconnecting clients can catch up
+    TOMBSTONE_RETENTION_SECONDS = int(os.getenv("TOMBSTONE_RETENTION_SECONDS", 30 * 24 * 3600))
+
+    # Expense inserts (see backend/writer.py): "direct" (one insert_one each) or
+    # "group" (concurrent inserts share one insert_many)
+    EXPENSE_WRITE_MODE = os.getenv("EXPENSE_WRITE_MODE", "direct")
+    GROUP_COMMIT_MAX_DOCS = int(os.getenv("GROUP_COMMIT_MAX_DOCS", 100))
+    GROUP_COMMIT_MAX_DELAY_MS = float(os.getenv("GROUP_COMMIT_MAX_DELAY_MS", 2))
+    # Expense layout (see backend/repository.py) for users not migrated by
+    # backend/migrate.py: "documents" (one per expense) or "buckets" (one per user and month)
+    EXPENSE_STORAGE = os.getenv("EXPENSE_STORAGE", "documents")
+    # A bucket stops taking new expenses once it would hold more than this many...
+    BUCKET_MAX_EXPENSES = int(os.getenv("BUCKET_MAX_EXPENSES", 1000))
+    # ...or embedded expenses this large; descriptions are unbounded and a
+    # MongoDB document cannot pass 16 MB
+    BUCKET_MAX_BYTES = int(os.getenv("BUCKET_MAX_BYTES", 4 * 1024 * 1024))
+
+    # Resets and deletes (see backend/purge.py)
+    # Soft-deleted expenses are removed by the TTL monitor this long after deletion
+    DELETED_EXPENSE_TTL = int(os.getenv("DELETED_EXPENSE_TTL", 0))
+    # Run the purge worker inside every API process; off when it runs on its own
+    PURGE_WORKER_ENABLED = os.getenv("PURGE_WORKER_ENABLED", "True").lower() == "true"
+    PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", 500))
+    # Expenses deleted per second per worker, 0 for no limit
+    PURGE_RATE = float(os.getenv("PURGE_RATE", 2000))
+    PURGE_POLL_INTERVAL = float(os.getenv("PURGE_POLL_INTERVAL", 5))
+    PURGE_LEASE_SECONDS = int(os.getenv("PURGE_LEASE_SECONDS", 60))
+
+    # Budget periods (see backend/periods.py): run the seal/backfill job inside
+    # every API process, and how often it runs
+    PERIOD_JOB_ENABLED = os.getenv("PERIOD_JOB_ENABLED", "True").lower() == "true"
+    PERIOD_JOB_INTERVAL = float(os.getenv("PERIOD_JOB_INTERVAL", 3600))
     WEBSOCKET_PORT = int(os.getenv("WEBSOCKET_PORT", 5001))
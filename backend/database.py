@@ -1,26 +1,295 @@
 # backend/database.py
-from pymongo import MongoClient
+"""One lazily created, fork-safe MongoClient per process.
+
+Nothing connects at import time. The client is built on first use with the
+pool, timeout, compression and concern settings from ``Config``, and again
+in any forked child (pre-fork servers must not share a parent's client).
+Modules keep importing ``users_collection`` and friends as before; those
+are thin proxies that resolve to the current process's client.
+"""
+import logging
 import os
-from dotenv import load_dotenv
+import threading
+
+from pymongo import MongoClient, monitoring
+
+from . import metrics
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Connection pool counters fed by pymongo's CMAP events."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.pools = 0
+            self.open_connections = 0
+            self.checked_out = 0
+            self.max_checked_out = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.total_wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "pools": self.pools,
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "avg_wait_ms": 1000 * self.total_wait_seconds / self.checkouts if self.checkouts else 0.0,
+                "max_wait_ms": 1000 * self.max_wait_seconds,
+            }
+
+    def pool_created(self, event):
+        with self._lock:
+            self.pools += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self.pools -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def connection_checked_out(self, event):
+        wait = getattr(event, "duration", None) or 0.0
+        with self._lock:
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self.checkouts += 1
+            self.total_wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
 
-load_dotenv()
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
 
-MONGO_USER = os.getenv("MONGO_USER")
-MONGO_PASSWORD = os.getenv("MONGO_PASSWORD")
-MONGO_CLUSTER = os.getenv("MONGO_CLUSTER")
-MONGO_DB = os.getenv("MONGO_DB", "expense_tracker")
+    def pool_ready(self, event):
+        pass
 
-# Build Atlas connection string
-MONGO_URI = (
-    f"mongodb+srv://{MONGO_USER}:{MONGO_PASSWORD}@{MONGO_CLUSTER}/{MONGO_DB}"
-    "?retryWrites=true&w=majority&tls=true"
+    def pool_cleared(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+
+pool_stats = PoolStats()
+
+metrics.Gauge(
+    "mongo_pool_connections",
+    "Connections in this process's pools, open and checked out",
+    lambda: {("open",): pool_stats.open_connections, ("checked_out",): pool_stats.checked_out},
+    ("state",),
+)
+metrics.Gauge("mongo_pool_checkouts_total", "Connection checkouts",
+              lambda: pool_stats.checkouts, kind="counter")
+metrics.Gauge("mongo_pool_checkout_failures_total", "Connection checkouts that failed or timed out",
+              lambda: pool_stats.checkout_failures, kind="counter")
+
+
+def query_shape(value):
+    """``value`` with every literal replaced by a placeholder, keeping keys and operators."""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = [query_shape(item) for item in value]
+        # Lists of literals ($in, positional args) collapse to one placeholder
+        return shapes if any(isinstance(item, (dict, list)) for item in shapes) else "?"
+    return "?"
+
+
+def _command_shape(command_name, command):
+    if command_name == "aggregate":
+        return query_shape(command.get("pipeline", []))
+    if command_name == "find":
+        return query_shape(command.get("filter", {}))
+    if command_name in ("findAndModify", "count"):
+        return query_shape(command.get("query", {}))
+    if command_name in ("update", "delete"):
+        return query_shape([op.get("q", {}) for op in command.get(command_name + "s", [])])
+    return None
+
+
+def _documents(command_name, reply):
+    cursor = reply.get("cursor")
+    if cursor is not None:
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", ())))
+    if command_name == "findAndModify":
+        return 1 if reply.get("value") else 0
+    return reply.get("n", 0)
+
+
+mongo_command_duration = metrics.Histogram(
+    "mongo_command_duration_seconds",
+    "MongoDB command round trip, by collection and command",
+    ("collection", "command"),
+)
+mongo_command_documents = metrics.Counter(
+    "mongo_command_documents_total",
+    "Documents returned (reads) or affected (writes), by collection and command",
+    ("collection", "command"),
 )
+mongo_command_failures = metrics.Counter(
+    "mongo_command_failures_total",
+    "Failed MongoDB commands, by collection and command",
+    ("collection", "command"),
+)
+
+
+class CommandStats(monitoring.CommandListener):
+    """Per-collection, per-command latency and document counts, plus slow-query logs.
+
+    The collection and filter only appear on the started event, so the
+    command is kept until the matching succeeded or failed event arrives;
+    its shape is only worked out if it turns out to be slow.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def started(self, event):
+        command = event.command
+        collection = command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = command.get("collection")
+        if not isinstance(collection, str):
+            collection = "-"
+        with self._lock:
+            self._inflight[(event.connection_id, event.request_id)] = (collection, command)
+
+    def _finish(self, event):
+        with self._lock:
+            started = self._inflight.pop((event.connection_id, event.request_id), None)
+        collection, command = started or ("-", {})
+        seconds = event.duration_micros / 1e6
+        mongo_command_duration.observe(seconds, collection, event.command_name)
+        if Config.SLOW_QUERY_MS >= 0 and seconds * 1000 >= Config.SLOW_QUERY_MS:
+            logger.warning("Slow MongoDB %s on %s: %.1f ms, shape %s", event.command_name, collection,
+                           seconds * 1000, _command_shape(event.command_name, command))
+        return collection
+
+    def succeeded(self, event):
+        collection = self._finish(event)
+        mongo_command_documents.inc(collection, event.command_name, amount=_documents(event.command_name, event.reply))
+
+    def failed(self, event):
+        collection = self._finish(event)
+        mongo_command_failures.inc(collection, event.command_name)
+
+
+command_stats = CommandStats()
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+# Wire compressors and the package each one needs on the client side
+_COMPRESSOR_PACKAGES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+
+def _available_compressors():
+    available = []
+    for name in filter(None, (c.strip() for c in Config.MONGO_COMPRESSORS.split(","))):
+        try:
+            __import__(_COMPRESSOR_PACKAGES.get(name, name))
+        except ImportError:
+            continue
+        available.append(name)
+    return available
+
+
+def client_options():
+    """Keyword arguments for MongoClient, all taken from Config."""
+    options = {
+        "maxPoolSize": Config.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": Config.MONGO_MIN_POOL_SIZE,
+        "waitQueueTimeoutMS": Config.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": Config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "w": int(Config.MONGO_WRITE_CONCERN) if Config.MONGO_WRITE_CONCERN.isdigit() else Config.MONGO_WRITE_CONCERN,
+        "event_listeners": [pool_stats, command_stats],
+    }
+    if Config.MONGO_READ_CONCERN:
+        options["readConcernLevel"] = Config.MONGO_READ_CONCERN
+    compressors = _available_compressors()
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    return options
+
+
+def get_client():
+    """The MongoClient for this process, created on first use (and after fork)."""
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                if not Config.MONGO_URI:
+                    raise ValueError("MongoDB environment variables are not properly configured.")
+                # A client inherited from the parent is abandoned, never closed:
+                # its sockets belong to the parent process.
+                if _client_pid != pid:
+                    pool_stats.reset()
+                _client = MongoClient(Config.MONGO_URI, **client_options())
+                _client_pid = pid
+    return _client
+
+
+def get_db():
+    return get_client()[Config.MONGO_DB]
+
+
+class LazyDatabase:
+    """Module-level stand-in for the Database; resolves on attribute access."""
+
+    def __getattr__(self, name):
+        return getattr(get_db(), name)
+
+    def __getitem__(self, name):
+        return get_db()[name]
+
+
+class LazyCollection:
+    """Module-level stand-in for a Collection; resolves on attribute access."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_db()[self.name], attr)
+
 
-# Connect to MongoDB Atlas
-client = MongoClient(MONGO_URI, tls=True)
-db = client[MONGO_DB]
+db = LazyDatabase()
 
 # Collections
-users_collection    = db["users"]
-expenses_collection = db["expenses"]
-budgets_collection  = db["budgets"]
+users_collection    = LazyCollection("users")
+expenses_collection = LazyCollection("expenses")
+budgets_collection  = LazyCollection("budgets")
+tombstones_collection = LazyCollection("expense_tombstones")
+purges_collection = LazyCollection("purges")
+periods_collection = LazyCollection("budget_periods")
+buckets_collection = LazyCollection("expense_buckets")
+migrations_collection = LazyCollection("expense_migrations")
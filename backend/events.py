@@ -0,0 +1,193 @@
+# backend/events.py
+"""Per-user publish/subscribe bus for pushing data changes to WebSockets.
+
+Routes publish small typed delta events on the user's channel (their email)
+and each ``/ws`` connection subscribes to its own channel. The in-memory
+broker only reaches connections in the same process; the change-stream
+broker writes events to MongoDB and every worker tails them, so all workers
+fan out to their own sockets.
+"""
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+from pymongo.errors import PyMongoError
+
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+EXPENSE_ADDED = "expense_added"
+EXPENSES_IMPORTED = "expenses_imported"
+EXPENSE_DELETED = "expense_deleted"
+BUDGET_CHANGED = "budget_changed"
+# Sent instead of the dropped events when a subscriber falls too far behind
+RESYNC = "resync"
+
+
+class Subscription:
+    """A bounded queue of events for one channel."""
+
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self._queue = queue.Queue(maxsize)
+        self._overflowed = False
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self._overflowed = True
+
+    def get(self, timeout=None):
+        """Next event, or ``None`` if nothing arrives within ``timeout`` seconds."""
+        if self._overflowed:
+            self._overflowed = False
+            with self._queue.mutex:
+                self._queue.queue.clear()
+            return {"event": RESYNC}
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def drain(self):
+        """Every event that is already waiting, without blocking."""
+        events = []
+        event = self.get(timeout=0)
+        while event is not None:
+            events.append(event)
+            event = self.get(timeout=0)
+        return events
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    """Interface every broker implements."""
+
+    def publish(self, channel, event):
+        raise NotImplementedError
+
+    def subscribe(self, channel):
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+
+class InMemoryBroker(Broker):
+    """Fan-out to subscribers living in this process."""
+
+    def __init__(self, queue_size=None):
+        self.queue_size = queue_size or Config.EVENT_QUEUE_SIZE
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.queue_size)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._channels.values())
+
+
+class MongoChangeStreamBroker(Broker):
+    """Publish through a MongoDB collection and tail it with a change stream.
+
+    Needs a replica set (Atlas clusters are). One watcher thread per process
+    is started on the first subscription and hands events to a local
+    ``InMemoryBroker``.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._local = InMemoryBroker()
+        self._watcher = None
+        self._lock = threading.Lock()
+
+    def publish(self, channel, event):
+        self.collection.insert_one({
+            "channel": channel,
+            "event": event,
+            "created_at": datetime.now(timezone.utc)
+        })
+
+    def subscribe(self, channel):
+        with self._lock:
+            if self._watcher is None or not self._watcher.is_alive():
+                self._watcher = threading.Thread(target=self._watch, name="event-watcher", daemon=True)
+                self._watcher.start()
+        return self._local.subscribe(channel)
+
+    def unsubscribe(self, subscription):
+        self._local.unsubscribe(subscription)
+
+    def subscriber_count(self):
+        return self._local.subscriber_count()
+
+    def _watch(self):
+        resume_token = None
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        while True:
+            try:
+                with self.collection.watch(pipeline, resume_after=resume_token) as stream:
+                    for change in stream:
+                        resume_token = stream.resume_token
+                        document = change["fullDocument"]
+                        self._local.publish(document["channel"], document["event"])
+            except PyMongoError as e:
+                logger.warning("Event change stream interrupted, retrying: %s", e)
+                time.sleep(1)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """The process-wide broker selected by ``Config.EVENT_BROKER``."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                if Config.EVENT_BROKER == "mongo":
+                    from backend.database import db
+                    _broker = MongoChangeStreamBroker(db["events"])
+                else:
+                    _broker = InMemoryBroker()
+    return _broker
+
+
+def publish(email, event_type, **data):
+    """Publish an event on ``email``'s channel. Failures never break the write path."""
+    try:
+        get_broker().publish(email, {"event": event_type, **data})
+    except Exception as e:
+        logger.warning("Could not publish %s for %s: %s", event_type, email, e)
+
+
+def budget_totals(budget):
+    """The totals a ``budget_changed`` event carries, from a ``BudgetModel``."""
+    return budget.totals() if budget else None
@@ -0,0 +1,74 @@
+# backend/export.py
+"""Incremental CSV / NDJSON encoders for expense exports.
+
+Nothing here touches the database: callers hand in any iterable of expense
+documents (normally a Mongo cursor) and get back an iterator of byte chunks
+that can be fed straight into a streaming response.
+"""
+import csv
+import io
+import zlib
+from datetime import datetime
+
+from bson.objectid import ObjectId
+
+from backend.serialization import dumps_bytes
+
+EXPORT_FIELDS = ("_id", "created_at", "amount", "category", "description")
+# Rows are buffered up to roughly this many bytes before a chunk is emitted
+FLUSH_SIZE = 64 * 1024
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+
+def _value(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _iter_csv(expenses):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for expense in expenses:
+        writer.writerow([_value(expense.get(field)) for field in EXPORT_FIELDS])
+        if buffer.tell() >= FLUSH_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def _iter_ndjson(expenses):
+    lines = []
+    size = 0
+    for expense in expenses:
+        line = dumps_bytes({field: expense.get(field) for field in EXPORT_FIELDS}) + b"\n"
+        lines.append(line)
+        size += len(line)
+        if size >= FLUSH_SIZE:
+            yield b"".join(lines)
+            lines = []
+            size = 0
+    yield b"".join(lines)
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def iter_export(expenses, fmt, compress=False):
+    """Encode ``expenses`` as ``fmt`` ("csv" or "ndjson"), optionally gzipped."""
+    chunks = _iter_csv(expenses) if fmt == "csv" else _iter_ndjson(expenses)
+    return _gzip(chunks) if compress else chunks
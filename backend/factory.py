@@ -0,0 +1,166 @@
+# backend/factory.py
+"""Application factory shared by every entry point.
+
+Each feature is an optional component. Components import their modules only
+when they are registered, and nothing touches MongoDB until the first
+request arrives (index creation runs then, once per process).
+"""
+import os
+import threading
+
+from flask import Flask, Response, jsonify
+from flask_cors import CORS
+
+from .config import Config
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+TEMPLATE_DIR = os.path.join(BASE_DIR, "../frontend")
+
+DEFAULT_COMPONENTS = ("auth", "users", "expenses", "budgets", "analytics", "ws", "static")
+
+
+def _register_auth(app):
+    from .auth import auth_bp
+    app.register_blueprint(auth_bp, url_prefix="/api")
+
+
+def _register_users(app):
+    from .routes.users import users_bp
+    app.register_blueprint(users_bp, url_prefix="/api")
+
+
+def _register_expenses(app):
+    from .routes.expenses import expenses_bp
+    app.register_blueprint(expenses_bp, url_prefix="/api")
+
+
+def _register_budgets(app):
+    from .routes.budgets import budgets_bp
+    app.register_blueprint(budgets_bp, url_prefix="/api")
+
+
+def _register_analytics(app):
+    from .routes.analytics import analytics_bp
+    app.register_blueprint(analytics_bp, url_prefix="/api")
+
+
+def _register_ws(app):
+    from .websockets import sock
+    # Protocol-level ping/pong doubles as the heartbeat and dead-peer detection
+    app.config["SOCK_SERVER_OPTIONS"] = {"ping_interval": app.config["WS_PING_INTERVAL"]}
+    sock.init_app(app)
+
+
+def _register_static(app):
+    from .assets import start_watcher
+    from .routes.static_files import static_bp, store
+    # Loaded here rather than lazily so the first page view never reads the disk
+    store.load()
+    if app.config.get("ASSET_WATCH"):
+        start_watcher(store, app.config["ASSET_WATCH_INTERVAL"])
+    app.register_blueprint(static_bp)
+
+
+COMPONENTS = {
+    "auth": _register_auth,
+    "users": _register_users,
+    "expenses": _register_expenses,
+    "budgets": _register_budgets,
+    "analytics": _register_analytics,
+    "ws": _register_ws,
+    "static": _register_static,
+}
+
+
+def _run_startup_tasks(app):
+    from pymongo.errors import PyMongoError
+    from .indexes import ensure_indexes, check_query_plans
+
+    if app.config.get("ENSURE_INDEXES_ON_STARTUP"):
+        try:
+            ensure_indexes()
+        except PyMongoError as e:
+            app.logger.error(f"Could not ensure indexes: {str(e)}")
+    if app.config.get("CHECK_QUERY_PLANS_ON_STARTUP"):
+        failures = check_query_plans()
+        if failures:
+            raise RuntimeError(f"Queries without a usable index: {failures}")
+    if app.config.get("PURGE_WORKER_ENABLED"):
+        from .purge import start_worker
+        start_worker()
+    if app.config.get("PERIOD_JOB_ENABLED"):
+        from .periods import start_worker
+        start_worker()
+
+
+def create_app(config=Config, components=DEFAULT_COMPONENTS):
+    """Build the Flask app with the given config object and components."""
+    unknown = set(components) - set(COMPONENTS)
+    if unknown:
+        raise ValueError(f"Unknown component(s): {', '.join(sorted(unknown))}")
+
+    app = Flask(__name__, template_folder=TEMPLATE_DIR)
+    app.config.from_object(config)
+    from .serialization import FastJSONProvider
+    app.json = FastJSONProvider(app)
+    # Allow CORS for localhost only
+    CORS(app, resources={
+        r"/api/*": {"origins": ["http://localhost:5173"]},
+        r"/ws": {"origins": ["http://localhost:5173"]}
+    }, supports_credentials=True)
+
+    from .sessions import StoreSessionInterface, create_store
+    app.config["SESSION_COOKIE_SAMESITE"] = "None"
+    app.config["SESSION_COOKIE_SECURE"] = True
+    app.session_interface = StoreSessionInterface(
+        create_store(app.config["SESSION_STORE"]),
+        app.config["SESSION_TTL"],
+        skip_prefixes=[p.strip() for p in app.config["SESSION_SKIP_PREFIXES"].split(",") if p.strip()]
+    )
+
+    for component in components:
+        COMPONENTS[component](app)
+
+    startup_done = False
+    startup_lock = threading.Lock()
+
+    @app.before_request
+    def run_startup_tasks():
+        nonlocal startup_done
+        if startup_done:
+            return
+        with startup_lock:
+            if not startup_done:
+                _run_startup_tasks(app)
+                startup_done = True
+
+    if app.config.get("METRICS_ENABLED"):
+        from . import metrics
+        metrics.init_app(app)
+
+        @app.route("/metrics", methods=["GET"])
+        def metrics_endpoint():
+            # Collectors register when their modules load; these are the ones /health reads too
+            from . import conditional, database  # noqa: F401
+            return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    if "static" not in components:
+        @app.route("/", methods=["GET"])
+        def home():
+            return jsonify({"message": "Expense Tracker Backend API"}), 200
+
+    @app.route("/health", methods=["GET"])
+    def health_check():
+        from .auth import token_cache
+        from .budget_cache import stats as budget_cache_stats
+        from .conditional import stats as conditional_stats
+        from .database import pool_stats
+        return jsonify({
+            "status": "ok",
+            "token_cache": token_cache.stats(),
+            "budget_cache": budget_cache_stats(),
+            "conditional_get": conditional_stats.snapshot(),
+            "mongo_pool": pool_stats.snapshot()
+        }), 200
+
+    return app
@@ -0,0 +1,176 @@
+# backend/indexes.py
+"""Index registry for every collection the API queries.
+
+``python -m backend.indexes`` creates the indexes (safe to re-run) and
+``python -m backend.indexes --check`` explains every query shape the routes
+issue and fails if any of them still needs a collection scan or an
+in-memory sort.
+"""
+import argparse
+import sys
+from datetime import datetime, timezone
+
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from backend.config import Config
+from backend.database import db
+
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+        # Prefix search and keyset paging on username in the user listing
+        IndexModel([("username", ASCENDING), ("_id", ASCENDING)], name="username_id"),
+    ],
+    "expenses": [
+        # Serves the per-user listing in both directions, including the _id tiebreak,
+        # and keeps reads of the live generation off expenses waiting to be purged.
+        # Replaces user_id_created_at, which can be dropped once this one is built.
+        IndexModel([("user_id", ASCENDING), ("generation", ASCENDING), ("created_at", DESCENDING),
+                    ("_id", DESCENDING)], name="user_id_generation_created_at"),
+        IndexModel([("deleted_at", ASCENDING)], name="deleted_at_ttl",
+                   expireAfterSeconds=Config.DELETED_EXPENSE_TTL),
+    ],
+    "expense_buckets": [
+        # Every bucket read and write: a user's live months in either direction.
+        # Deleting by expense id scans only that user's buckets, so the embedded
+        # ids are deliberately left unindexed.
+        IndexModel([("user_id", ASCENDING), ("generation", ASCENDING), ("month", DESCENDING)],
+                   name="user_id_generation_month"),
+    ],
+    "budgets": [
+        IndexModel([("email", ASCENDING), ("is_active", ASCENDING)], name="email_is_active"),
+    ],
+    "expense_tombstones": [
+        IndexModel([("user_id", ASCENDING), ("deleted_at", ASCENDING)], name="user_id_deleted_at"),
+        IndexModel([("deleted_at", ASCENDING)], name="deleted_at_ttl",
+                   expireAfterSeconds=Config.TOMBSTONE_RETENTION_SECONDS),
+    ],
+    "sessions": [
+        # expires_at is the absolute expiry, so documents go as soon as it passes
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "budget_periods": [
+        IndexModel([("email", ASCENDING), ("period", ASCENDING), ("start", ASCENDING)], unique=True,
+                   name="email_period_start_unique"),
+        # The seal job's scan for periods that have ended
+        IndexModel([("sealed", ASCENDING), ("end", ASCENDING)], name="sealed_end"),
+    ],
+    "purges": [
+        IndexModel([("lease_until", ASCENDING)], name="lease_until"),
+    ],
+    "events": [
+        # Published WebSocket deltas only need to outlive the change stream's resume window
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl",
+                   expireAfterSeconds=Config.EVENT_RETENTION_SECONDS),
+    ],
+}
+
+BAD_STAGES = {"COLLSCAN", "SORT"}
+
+
+def ensure_indexes():
+    """Create every registered index. Existing ones are left untouched."""
+    created = {}
+    for collection, models in INDEXES.items():
+        created[collection] = db[collection].create_indexes(models)
+    return created
+
+
+def query_shapes():
+    """The finds the routes issue, keyed by a readable name.
+
+    Values are placeholders; only the shape of the filter and sort matters to
+    the planner.
+    """
+    email = "index-check@example.com"
+    now = datetime.now(timezone.utc)
+    oid = ObjectId()
+    return {
+        "users by email": db.users.find({"email": email}).limit(1),
+        "users page": db.users.find({"_id": {"$gt": oid}}).sort([("_id", ASCENDING)]),
+        "users by email prefix": db.users.find({"email": {"$regex": "^index", "$gt": email}})
+            .sort([("email", ASCENDING)]),
+        "users by username prefix": db.users.find({
+            "username": {"$regex": "^index"},
+            "$or": [{"username": {"$gt": "index"}}, {"username": "index", "_id": {"$gt": oid}}],
+        }).sort([("username", ASCENDING), ("_id", ASCENDING)]),
+        "active budget by email": db.budgets.find({"email": email, "is_active": True}).limit(1),
+        "budget by email": db.budgets.find({"email": email}).limit(1),
+        "expenses by user, newest first": db.expenses.find({"user_id": email, "generation": None})
+            .sort([("created_at", DESCENDING), ("_id", DESCENDING)]),
+        "expenses after cursor": db.expenses.find({
+            "user_id": email,
+            "generation": 2,
+            "$or": [{"created_at": {"$lt": now}}, {"created_at": now, "_id": {"$lt": oid}}],
+        }).sort([("created_at", DESCENDING), ("_id", DESCENDING)]),
+        "expense by id and user": db.expenses.find({"_id": oid, "user_id": email, "generation": None}).limit(1),
+        "expenses after sync watermark": db.expenses.find({
+            "user_id": email,
+            "generation": None,
+            "$or": [{"created_at": {"$gt": now}}, {"created_at": now, "_id": {"$gt": oid}}],
+        }).sort([("created_at", ASCENDING), ("_id", ASCENDING)]),
+        "expenses awaiting purge": db.expenses.find({
+            "user_id": email, "$or": [{"generation": {"$lt": 2}}, {"generation": None}],
+        }).limit(1),
+        "current budget period": db.budget_periods.find({"email": email, "period": "monthly", "start": now})
+            .limit(1),
+        "budget periods to seal": db.budget_periods.find({"sealed": False, "end": {"$lte": now}}),
+        "expenses in period": db.expenses.find({
+            "user_id": email, "generation": None, "created_at": {"$gte": now, "$lt": now},
+        }),
+        "expense buckets by user, newest month first": db.expense_buckets.find({
+            "user_id": email, "generation": None, "month": {"$lte": now},
+        }).sort([("month", DESCENDING)]),
+        "expense bucket with room": db.expense_buckets.find({
+            "user_id": email, "generation": None, "month": now,
+            "count": {"$lte": 999}, "bytes": {"$lte": 4 * 1024 * 1024},
+        }).limit(1),
+        "tombstones since": db.expense_tombstones.find({"user_id": email, "deleted_at": {"$gt": now}}),
+    }
+
+
+def _stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _stages(item)
+
+
+def check_query_plans():
+    """Explain every query shape and return ``{name: [bad stages]}`` for failures."""
+    failures = {}
+    for name, cursor in query_shapes().items():
+        winning_plan = cursor.explain()["queryPlanner"]["winningPlan"]
+        bad = sorted(BAD_STAGES.intersection(_stages(winning_plan)))
+        if bad:
+            failures[name] = bad
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create and verify MongoDB indexes.")
+    parser.add_argument("--check", action="store_true",
+                        help="explain every route query and fail on COLLSCAN or in-memory SORT")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        failures = check_query_plans()
+        for name, stages in failures.items():
+            print(f"FAIL {name}: {', '.join(stages)}")
+        if failures:
+            return 1
+        print("All query shapes are served by an index")
+        return 0
+
+    for collection, names in ensure_indexes().items():
+        print(f"{collection}: {', '.join(names)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
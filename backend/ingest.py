@@ -0,0 +1,113 @@
+# backend/ingest.py
+"""Incremental parsers for bulk expense uploads.
+
+Each parser reads the request body in fixed-size chunks and yields one row
+dict at a time, so memory stays flat however large the upload is.
+"""
+import codecs
+import csv
+import json
+
+READ_CHUNK_SIZE = 64 * 1024
+# A single JSON element larger than this is treated as malformed input
+MAX_ELEMENT_SIZE = 1024 * 1024
+
+
+class IngestError(ValueError):
+    """The upload could not be parsed any further."""
+
+
+def _iter_text(stream):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        for chunk in iter(lambda: stream.read(READ_CHUNK_SIZE), b""):
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise IngestError("Upload is not valid UTF-8") from None
+    if tail:
+        yield tail
+
+
+def _iter_lines(stream):
+    pending = ""
+    for text in _iter_text(stream):
+        lines = (pending + text).splitlines(keepends=True)
+        pending = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        yield from lines
+    if pending:
+        yield pending
+
+
+def iter_json_array(stream):
+    """Yield the elements of a top-level JSON array without loading all of it."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    chunks = _iter_text(stream)
+    eof = False
+
+    while True:
+        buffer = buffer.lstrip()
+        if not started and buffer:
+            if buffer[0] != "[":
+                raise IngestError("Expected a JSON array")
+            buffer = buffer[1:]
+            started = True
+            continue
+        if started and buffer.startswith(","):
+            buffer = buffer[1:]
+            continue
+        if started and buffer.startswith("]"):
+            return
+        if started and buffer:
+            try:
+                row, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise IngestError("Malformed JSON array")
+                if len(buffer) > MAX_ELEMENT_SIZE:
+                    raise IngestError("JSON element too large")
+            else:
+                yield row
+                buffer = buffer[end:]
+                continue
+        if eof:
+            raise IngestError("Unexpected end of JSON array")
+        try:
+            buffer += next(chunks)
+        except StopIteration:
+            eof = True
+
+
+def iter_ndjson(stream):
+    """Yield one JSON document per non-blank line."""
+    for number, line in enumerate(_iter_lines(stream), start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            raise IngestError(f"Malformed JSON on line {number}")
+
+
+def iter_csv(stream):
+    """Yield one dict per CSV record, keyed by the header row."""
+    try:
+        yield from csv.DictReader(_iter_lines(stream))
+    except csv.Error as e:
+        raise IngestError(f"Malformed CSV: {e}")
+
+
+PARSERS = {
+    "application/json": iter_json_array,
+    "application/x-ndjson": iter_ndjson,
+    "application/ndjson": iter_ndjson,
+    "text/csv": iter_csv,
+}
+
+
+def parser_for(mimetype):
+    return PARSERS.get(mimetype)
@@ -0,0 +1,138 @@
+# backend/invalidation.py
+"""Channels that tell every worker's in-process caches to drop a key.
+
+A cache subscribes a callback to its topic and publishes the keys it
+changes. ``InMemoryChannel`` only reaches the current process, which is all
+a single worker needs. ``MongoCappedChannel`` writes each message to a
+capped collection that a thread in every process tails, so workers also
+hear about each other's writes. It works on a standalone mongod, where
+change streams do not. If tailing breaks, messages may have been missed,
+so subscribers are told to drop everything (``key`` of ``None``).
+Caches still bound staleness with their own TTL in case messages are
+late.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class Channel:
+    """Interface every invalidation channel implements."""
+
+    def publish(self, topic, key):
+        raise NotImplementedError
+
+    def subscribe(self, topic, callback):
+        raise NotImplementedError
+
+
+class InMemoryChannel(Channel):
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, topic, key):
+        with self._lock:
+            callbacks = list(self._subscribers.get(topic, ()))
+        for callback in callbacks:
+            callback(key)
+
+    def subscribe(self, topic, callback):
+        with self._lock:
+            self._subscribers.setdefault(topic, []).append(callback)
+
+    def topics(self):
+        with self._lock:
+            return list(self._subscribers)
+
+
+class MongoCappedChannel(Channel):
+    """Publish through a capped collection and tail it from every process.
+
+    Messages from this process are applied locally right away and again when
+    they come back through the tail, which is harmless for invalidation.
+    """
+
+    def __init__(self, db, name="cache_invalidations", size=None):
+        self.db = db
+        self.name = name
+        self.size = size or Config.CACHE_INVALIDATION_CAP_BYTES
+        self._local = InMemoryChannel()
+        self._tailer = None
+        self._lock = threading.Lock()
+
+    @property
+    def collection(self):
+        return self.db[self.name]
+
+    def _ensure_collection(self):
+        try:
+            self.db.create_collection(self.name, capped=True, size=self.size)
+            # A tailable cursor on an empty capped collection dies at once
+            self.collection.insert_one({"topic": None, "key": None, "created_at": datetime.now(timezone.utc)})
+        except CollectionInvalid:
+            pass
+
+    def publish(self, topic, key):
+        self._local.publish(topic, key)
+        try:
+            self.collection.insert_one({"topic": topic, "key": key, "created_at": datetime.now(timezone.utc)})
+        except PyMongoError as e:
+            # Other workers fall back on their TTL for this key
+            logger.warning("Could not publish invalidation of %s/%s: %s", topic, key, e)
+
+    def subscribe(self, topic, callback):
+        self._local.subscribe(topic, callback)
+        with self._lock:
+            if self._tailer is None or not self._tailer.is_alive():
+                self._tailer = threading.Thread(target=self._tail, name="invalidation-tailer", daemon=True)
+                self._tailer.start()
+
+    def _drop_everything(self):
+        for topic in self._local.topics():
+            self._local.publish(topic, None)
+
+    def _tail(self):
+        started = False
+        while True:
+            try:
+                self._ensure_collection()
+                if started:
+                    self._drop_everything()
+                started = True
+                # Starts from the oldest message: replaying drops are harmless, and
+                # ObjectIds from several processes are not ordered enough to skip by
+                cursor = self.collection.find(cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    for message in cursor:
+                        if message.get("topic") is not None:
+                            self._local.publish(message["topic"], message["key"])
+            except PyMongoError as e:
+                logger.warning("Invalidation tail interrupted, retrying: %s", e)
+            time.sleep(1)
+
+
+_channel = None
+_channel_lock = threading.Lock()
+
+
+def get_channel():
+    """The process-wide channel selected by ``Config.CACHE_INVALIDATION``."""
+    global _channel
+    if _channel is None:
+        with _channel_lock:
+            if _channel is None:
+                if Config.CACHE_INVALIDATION == "mongo":
+                    from backend.database import db
+                    _channel = MongoCappedChannel(db)
+                else:
+                    _channel = InMemoryChannel()
+    return _channel
@@ -0,0 +1,216 @@
+# backend/ledger.py
+"""Running per-user spend counters kept on the budget document.
+
+Every expense write moves ``spent`` and ``expense_count`` on the user's
+budget with a single ``$inc`` so reads never have to re-aggregate or count
+the whole expense history. The same document carries ``version``, bumped by
+every expense and budget write, which conditional GETs turn into ETags.
+``python -m backend.ledger reconcile`` rebuilds the counters from the
+``expenses`` collection if they ever drift. Budgets created before the
+counters existed get them from ``seed`` the first time they are read.
+
+Monthly and weekly budgets check their limit against the period's rollup
+instead (see ``backend.periods``); the counters here still cover the whole
+history.
+"""
+import argparse
+
+from pymongo import ReturnDocument, UpdateOne
+
+from backend import budget_cache, periods, purge, repository
+from backend.database import budgets_collection, users_collection
+from backend.models import BudgetModel
+
+RECONCILE_BATCH_SIZE = 1000
+
+
+def _budget(doc):
+    return BudgetModel.from_doc(doc) if doc else None
+
+
+def _reserve(config, email, amount, count, when):
+    if not config.period:
+        return _budget(budgets_collection.find_one_and_update(
+            {
+                "email": email,
+                "is_active": True,
+                "period": None,
+                "$expr": {"$lte": [{"$add": [{"$ifNull": ["$spent", 0]}, amount]}, "$amount"]},
+            },
+            {"$inc": {"spent": amount, "expense_count": count, "version": 1}},
+            return_document=ReturnDocument.AFTER,
+        ))
+
+    current = periods.reserve(config, amount, count, when)
+    if current is None:
+        return None
+    budget = _budget(budgets_collection.find_one_and_update(
+        {"email": email, "is_active": True, "period": config.period, "reset_day": config.reset_day},
+        {"$inc": {"spent": amount, "expense_count": count, "version": 1}},
+        return_document=ReturnDocument.AFTER,
+    ))
+    if budget is None:
+        # The budget changed under the cached copy
+        periods.release(config, amount, count, when)
+        return None
+    budget.current = current
+    return budget
+
+
+def reserve(email, amount, count=1, when=None):
+    """Add ``amount`` (spread over ``count`` expenses) to the active budget's
+    counters if there is room left.
+
+    The room check and the increment happen in one conditional update, so two
+    concurrent adds can never both squeeze past the limit. For a periodic
+    budget that update is on the rollup of the period containing ``when``.
+    Returns the updated ``BudgetModel``, or ``None`` when there is no active
+    budget or not enough left in it.
+    """
+    config = budget_cache.get(email)
+    for _ in range(2):
+        if config is None:
+            return None
+        budget = _reserve(config, email, amount, count, when)
+        if budget is not None:
+            return budget
+        # Refused; retry once if the cached config turns out to be stale
+        budget_cache.forget(email)
+        fresh = budget_cache.get(email)
+        if fresh is None or (fresh.period, fresh.reset_day) == (config.period, config.reset_day):
+            return None
+        config = fresh
+    return None
+
+
+def release(email, amount, count=1, when=None):
+    """Give ``amount`` back to the user's budget after expenses go away.
+
+    ``when`` is when the expenses were created, which picks the period a
+    periodic budget gives the amount back to. Returns the updated
+    ``BudgetModel``, or ``None`` if the user has none.
+    """
+    budget = budgets_collection.find_one_and_update(
+        {"email": email, "spent": {"$exists": True}},
+        {"$inc": {"spent": -amount, "expense_count": -count, "version": 1}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if budget is None:
+        # Not seeded yet; seeding counts the expenses, which no longer include these
+        budget = seed(budgets_collection.find_one({"email": email}))
+    budget = _budget(budget)
+    budget_cache.forget(email)
+    if budget and budget.period:
+        current = periods.release(budget, amount, count, when) if when else None
+        if current is None or not periods.is_current(current):
+            current = periods.load_current(budget)
+        budget.current = current
+    return budget
+
+
+def touch(email):
+    """Bump the user's data version once a write has landed.
+
+    ``reserve`` bumps it too, but before the expense exists; without a second
+    bump a read in between would tag the old listing with the new version.
+    """
+    budgets_collection.update_one({"email": email}, {"$inc": {"version": 1}})
+
+
+def data_version(email):
+    """The user's data version, or ``None`` if they have no budget document yet."""
+    budget = budgets_collection.find_one({"email": email}, {"version": 1})
+    if budget is None:
+        return None
+    return budget.get("version", 0)
+
+
+def expense_count(email):
+    """Number of expenses a user has, read from the counter when there is one."""
+    budget = seed(budgets_collection.find_one({"email": email}, {"email": 1, "spent": 1, "expense_count": 1}))
+    if budget:
+        return budget["expense_count"]
+    repo, generation = repository.for_user(email)
+    return repo.totals(purge.live(email, generation))["expense_count"]
+
+
+def tally(email):
+    """Count and sum a user's expenses from scratch.
+
+    Only used to seed or repair the counters, never on the request path.
+    """
+    repo, generation = repository.for_user(email)
+    return repo.totals(purge.live(email, generation))
+
+
+def seed(doc):
+    """Fill in the counters on a budget document that predates them.
+
+    ``doc`` is a budget document (or ``None``); it is returned unchanged if
+    it already has counters, otherwise as it reads after seeding.
+    """
+    if doc is None or "spent" in doc:
+        return doc
+    # Only the first seed lands; a concurrent one just reads what it wrote
+    seeded = budgets_collection.find_one_and_update(
+        {"_id": doc["_id"], "spent": {"$exists": False}},
+        {"$set": tally(doc["email"]), "$inc": {"version": 1}},
+        return_document=ReturnDocument.AFTER,
+    )
+    return seeded or budgets_collection.find_one({"_id": doc["_id"]})
+
+
+def reconcile(email=None):
+    """Rebuild the counters on every budget (or one user's) from the expenses.
+
+    Writes that land while this runs can be overwritten, so run it when the
+    API is quiet. Returns the number of budgets that were updated.
+    """
+    match = {"user_id": email} if email else {}
+    generations = {
+        user["email"]: user.get("generation", 0)
+        for user in users_collection.find({"email": email} if email else {}, {"email": 1, "generation": 1})
+    }
+    totals = {}
+    # Each user's expenses live in one layout, except while backend.migrate moves them
+    for repo in repository.LAYOUTS.values():
+        for row in repo.aggregate(match, [
+            {"$group": {"_id": {"user_id": "$user_id", "generation": "$generation"},
+                        "spent": {"$sum": "$amount"}, "expense_count": {"$sum": 1}}}
+        ]):
+            # Only the live generation counts; reset and deleted expenses are waiting to be purged
+            user_id = row["_id"]["user_id"]
+            if purge.stored(generations.get(user_id, 0)) == row["_id"].get("generation"):
+                total = totals.setdefault(user_id, {"spent": 0, "expense_count": 0})
+                total["spent"] += row["spent"]
+                total["expense_count"] += row["expense_count"]
+
+    updated = 0
+    batch = []
+    for budget in budgets_collection.find({"email": email} if email else {}, {"email": 1}):
+        batch.append(UpdateOne(
+            {"_id": budget["_id"]},
+            {"$set": totals.get(budget["email"], {"spent": 0, "expense_count": 0}), "$inc": {"version": 1}}
+        ))
+        if len(batch) >= RECONCILE_BATCH_SIZE:
+            updated += budgets_collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += budgets_collection.bulk_write(batch, ordered=False).modified_count
+    return updated
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain per-user spend counters.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    reconcile_cmd = commands.add_parser("reconcile", help="rebuild counters from the expenses collection")
+    reconcile_cmd.add_argument("--email", help="only reconcile this user")
+    args = parser.parse_args(argv)
+
+    if args.command == "reconcile":
+        updated = reconcile(args.email)
+        print(f"Reconciled spend counters, {updated} budget(s) changed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# backend/migrate.py
+"""Move users' expenses from the documents layout to buckets, with the API up.
+
+Each user moves on their own, in three steps:
+
+1. Copy: their live expense documents are copied into buckets in batches,
+   oldest first, while reads and writes keep using the documents. Progress
+   is kept on an ``expense_migrations`` document, so an interrupted run
+   picks up where it stopped.
+2. Switch: ``storage`` on the user document flips to ``buckets`` and every
+   request after that uses the buckets (see ``repository.for_user``).
+3. Drain: after a grace period for requests that picked the documents
+   layout just before the switch, every document left is moved over (if
+   the copy does not have it yet) and deleted; expenses from reset
+   generations are just deleted, as the purge worker would. Deletes that
+   landed during the copy are replayed from the tombstones.
+
+The ledger counters do not change, since no expense is added or removed.
+Batches are rate limited like the purge worker's.
+
+    python -m backend.migrate --email someone@example.com
+    python -m backend.migrate --batch-size 1000 --rate 5000
+"""
+import argparse
+import logging
+import time
+from datetime import datetime, timezone
+
+from pymongo import ReturnDocument
+
+from backend import purge, repository
+from backend.config import Config
+from backend.database import expenses_collection, migrations_collection, tombstones_collection, users_collection
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+# Expenses moved per second, 0 for no limit
+RATE = 2000
+# Seconds between the switch and the drain, at least USER_CACHE_TTL
+GRACE_SECONDS = 10
+
+
+class Migrator:
+    """Moves one user at a time from ``expenses`` to ``expense_buckets``."""
+
+    def __init__(self, batch_size=None, rate=None, grace=None):
+        self.batch_size = batch_size or BATCH_SIZE
+        self.rate = RATE if rate is None else rate
+        self.grace = GRACE_SECONDS if grace is None else grace
+        self.buckets = repository.get("buckets")
+
+    def _pause(self, count):
+        if self.rate > 0:
+            time.sleep(count / self.rate)
+
+    def _missing(self, email, docs):
+        """The ``docs`` the user's buckets do not hold yet."""
+        ids = [doc["_id"] for doc in docs]
+        present = set()
+        for bucket in self.buckets.collection.find({"user_id": email, "expenses._id": {"$in": ids}},
+                                                   {"expenses._id": 1}):
+            present.update(expense["_id"] for expense in bucket["expenses"])
+        return [doc for doc in docs if doc["_id"] not in present]
+
+    def copy(self, email, job):
+        """Step 1: copy the live expenses past the job's watermark."""
+        copied = 0
+        live = purge.live(email)
+        after = job.get("after")
+        # The batch being written when an earlier run stopped may already be in the buckets
+        check = True
+        while True:
+            query = dict(live)
+            if after:
+                query["$or"] = [{"created_at": {"$gt": after[0]}},
+                                {"created_at": after[0], "_id": {"$gt": after[1]}}]
+            docs = list(expenses_collection.find(query).sort([("created_at", 1), ("_id", 1)])
+                        .limit(self.batch_size))
+            if not docs:
+                return copied
+            after = [docs[-1]["created_at"], docs[-1]["_id"]]
+            if check:
+                docs, check = self._missing(email, docs), False
+            if docs:
+                self.buckets.insert_many(docs)
+            migrations_collection.update_one({"_id": email}, {"$set": {"after": after}})
+            copied += len(docs)
+            self._pause(len(docs))
+
+    def drain(self, email):
+        """Step 3: move whatever is still in documents, then delete it there."""
+        moved = 0
+        while True:
+            docs = list(expenses_collection.find({"user_id": email}).limit(self.batch_size))
+            if not docs:
+                return moved
+            gen = purge.stored(purge.generation(email))
+            missing = self._missing(email, [doc for doc in docs if doc.get("generation") == gen])
+            if missing:
+                self.buckets.insert_many(missing)
+            for doc in docs:
+                if doc.get("generation") == purge.DELETED:
+                    # Deleted after it was copied
+                    self.buckets.remove({"user_id": email}, doc["_id"])
+            expenses_collection.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+            moved += len(missing)
+            self._pause(len(docs))
+
+    def replay_deletes(self, email, since):
+        """Remove copies of expenses deleted since the copy started.
+
+        Catches deleted documents the TTL index removed before the drain saw them.
+        """
+        removed = 0
+        for tombstone in tombstones_collection.find(
+                {"user_id": email, "deleted_at": {"$gte": since}, "expense_id": {"$ne": None}}, {"expense_id": 1}):
+            removed += self.buckets.remove({"user_id": email}, tombstone["expense_id"]) is not None
+        return removed
+
+    def migrate_user(self, email):
+        """Move one user's expenses. Returns how many were copied, or ``None``
+        if there was nothing to do."""
+        user = users_collection.find_one({"email": email}, {"storage": 1})
+        job = migrations_collection.find_one({"_id": email})
+        if user is None or (user.get("storage") == "buckets" and job is None):
+            return None
+        if job is None:
+            job = migrations_collection.find_one_and_update(
+                {"_id": email},
+                {"$setOnInsert": {"started_at": datetime.now(timezone.utc), "after": None}},
+                upsert=True, return_document=ReturnDocument.AFTER,
+            )
+
+        copied = self.copy(email, job)
+        users_collection.update_one({"email": email}, {"$set": {"storage": "buckets"}})
+        repository.invalidate(email)
+        # Workers the invalidation misses still drop the old layout within USER_CACHE_TTL
+        time.sleep(max(self.grace, Config.USER_CACHE_TTL))
+        copied += self.drain(email)
+        removed = self.replay_deletes(email, job["started_at"])
+        migrations_collection.delete_one({"_id": email})
+        logger.info("Moved %s to buckets: %d expenses copied, %d deletes replayed", email, copied, removed)
+        return copied
+
+    def pending(self):
+        """Emails still to move: users not on buckets yet, and unfinished runs."""
+        emails = [job["_id"] for job in migrations_collection.find({}, {"_id": 1})]
+        emails += [user["email"] for user in users_collection.find({"storage": {"$ne": "buckets"}}, {"email": 1})]
+        return list(dict.fromkeys(emails))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move expenses from one document each to monthly buckets.")
+    parser.add_argument("--email", help="only move this user")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--rate", type=float, help="expenses per second (0 for no limit)")
+    parser.add_argument("--grace", type=float, help="seconds between the switch and the drain")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    migrator = Migrator(args.batch_size, args.rate, args.grace)
+    users = copied = 0
+    for email in [args.email] if args.email else migrator.pending():
+        result = migrator.migrate_user(email)
+        if result is not None:
+            users += 1
+            copied += result
+    print(f"Moved {users} user(s), {copied} expense(s) to buckets")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,377 @@
-from bson import ObjectId
+# backend/models.py
+"""The document schema for every collection, as slotted classes.
+
+Field names here are the ones stored in MongoDB and targeted by
+``backend/indexes.py``: expenses belong to a user through ``user_id``
+(the owner's email) and are dated by ``created_at``; budgets are keyed by
+``email``. Routes build documents with ``to_doc`` and read them back with
+``from_doc`` rather than assembling dicts by hand.
+
+``from_doc`` trusts what is already in the database and does no checking;
+input from clients goes through ``from_input``, which validates it.
+``to_doc`` leaves out fields that are ``None``, so projected documents
+round-trip without growing ``null`` fields.
+"""
+import copy
+import math
+from array import array
 from datetime import datetime, timezone
 
+DEFAULT_CATEGORY = "uncategorized"
+# Budget periods besides the default lifetime budget (stored as no period)
+PERIODS = {"monthly": (1, 28), "weekly": (0, 6)}
+
+
+class ValidationError(ValueError):
+    """Client input that does not fit the schema."""
+
+
+def parse_amount(value):
+    """A positive float from client input, or ``ValidationError``."""
+    if value in (None, ""):
+        raise ValidationError("Missing required field: amount")
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        raise ValidationError("Invalid amount format")
+    if not amount > 0:
+        raise ValidationError("Amount must be greater than zero")
+    if not math.isfinite(amount):
+        raise ValidationError("Amount must be a finite number")
+    return amount
+
+
+def parse_period(data):
+    """``(period, reset_day)`` from a budget request body, or ``ValidationError``.
+
+    ``period`` is ``None`` for a lifetime budget. ``reset_day`` is the day of
+    the month (1-28) or of the week (0 is Monday) a period starts on.
+    """
+    period = data.get("period") or None
+    if period in (None, "lifetime"):
+        return None, None
+    if period not in PERIODS:
+        raise ValidationError("period must be lifetime, monthly or weekly")
+    low, high = PERIODS[period]
+    reset_day = data.get("reset_day", low)
+    if isinstance(reset_day, bool) or not isinstance(reset_day, int) or not low <= reset_day <= high:
+        raise ValidationError(f"reset_day must be an integer from {low} to {high} for a {period} budget")
+    return period, reset_day
+
+
+def epoch(value):
+    """Seconds since the epoch; Mongo hands back naive datetimes that are already UTC."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _compact(doc):
+    return {key: value for key, value in doc.items() if value is not None}
+
+
 class UserModel:
+    __slots__ = ("id", "username", "email", "password")
+
     def __init__(self, username, email, password, id=None):
-        self.id = ObjectId(id) if id else ObjectId()
+        self.id = id
         self.username = username
         self.email = email
         self.password = password
 
-    def to_dict(self):
-        return {
-            "_id": str(self.id),
+    @classmethod
+    def from_doc(cls, doc):
+        user = cls.__new__(cls)
+        user.id = doc.get("_id")
+        user.username = doc.get("username")
+        user.email = doc.get("email")
+        user.password = doc.get("password")
+        return user
+
+    def to_doc(self):
+        return _compact({
+            "_id": self.id,
             "username": self.username,
             "email": self.email,
             "password": self.password,
-        }
+        })
+
 
 class ExpenseModel:
-    def __init__(self, user_id, category, amount, description=None, date=None, id=None):
-        self.id = ObjectId(id) if id else ObjectId()
+    __slots__ = ("id", "user_id", "amount", "category", "description", "created_at", "generation")
+
+    # What clients can read; ``generation`` is bookkeeping for backend.purge
+    FIELDS = ("_id", "user_id", "amount", "category", "description", "created_at")
+
+    def __init__(self, user_id, amount, category=DEFAULT_CATEGORY, description="", created_at=None, id=None,
+                 generation=None):
+        self.id = id
         self.user_id = user_id
-        self.category = category
         self.amount = amount
+        self.category = category
         self.description = description
-        self.date = date or datetime.now(timezone.utc)
+        self.created_at = created_at
+        self.generation = generation
 
-    def to_dict(self):
-        return {
-            "_id": str(self.id),
+    @classmethod
+    def from_input(cls, data, user_id):
+        """Validate a client-supplied expense (JSON body or import row)."""
+        if not isinstance(data, dict):
+            raise ValidationError("Row must be an object")
+        return cls(
+            user_id,
+            parse_amount(data.get("amount")),
+            category=str(data.get("category") or DEFAULT_CATEGORY),
+            description=str(data.get("description") or ""),
+        )
+
+    @classmethod
+    def from_doc(cls, doc):
+        expense = cls.__new__(cls)
+        expense.id = doc.get("_id")
+        expense.user_id = doc.get("user_id")
+        expense.amount = doc.get("amount")
+        expense.category = doc.get("category")
+        expense.description = doc.get("description")
+        expense.created_at = doc.get("created_at")
+        expense.generation = doc.get("generation")
+        return expense
+
+    def to_doc(self, fields=None):
+        doc = _compact({
+            "_id": self.id,
             "user_id": self.user_id,
-            "category": self.category,
             "amount": self.amount,
+            "category": self.category,
             "description": self.description,
-            "date": self.date,
-        }
+            "created_at": self.created_at,
+            "generation": self.generation,
+        })
+        if fields is not None:
+            doc = {field: doc[field] for field in fields if field in doc}
+        return doc
+
 
 class BudgetModel:
-    def __init__(self, user_id, amount, id=None):
-        self.id = ObjectId(id) if id else ObjectId()
-        self.user_id = user_id
+    """A user's budget and the running counters ``backend.ledger`` keeps on it.
+
+    ``spent`` and ``expense_count`` cover the user's whole history. For a
+    periodic budget the limit applies per period instead, and ``current``
+    is the current period's ``PeriodModel`` when the caller loaded it; it is
+    never stored.
+    """
+
+    __slots__ = ("id", "email", "amount", "spent", "expense_count", "version",
+                 "is_active", "created_at", "updated_at", "period", "reset_day", "current")
+
+    def __init__(self, email, amount, spent=0, expense_count=0, version=1,
+                 is_active=True, created_at=None, updated_at=None, id=None, period=None, reset_day=None):
+        self.id = id
+        self.email = email
         self.amount = amount
+        self.spent = spent
+        self.expense_count = expense_count
+        self.version = version
+        self.is_active = is_active
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.period = period
+        self.reset_day = reset_day
+        self.current = None
 
-    def to_dict(self):
+    @classmethod
+    def from_doc(cls, doc):
+        budget = cls.__new__(cls)
+        budget.id = doc.get("_id")
+        budget.email = doc.get("email")
+        budget.amount = doc.get("amount")
+        budget.spent = doc.get("spent", 0)
+        budget.expense_count = doc.get("expense_count", 0)
+        budget.version = doc.get("version", 0)
+        budget.is_active = doc.get("is_active", False)
+        budget.created_at = doc.get("created_at")
+        budget.updated_at = doc.get("updated_at")
+        budget.period = doc.get("period")
+        budget.reset_day = doc.get("reset_day")
+        budget.current = None
+        return budget
+
+    @property
+    def remaining(self):
+        if self.period:
+            return self.amount - (self.current.spent if self.current else 0)
+        return self.amount - self.spent
+
+    def with_current(self, current):
+        """A copy of this budget carrying ``current``, leaving shared (cached) ones alone."""
+        budget = copy.copy(self)
+        budget.current = current
+        return budget
+
+    def to_doc(self):
+        return _compact({
+            "_id": self.id,
+            "email": self.email,
+            "amount": self.amount,
+            "spent": self.spent,
+            "expense_count": self.expense_count,
+            "version": self.version,
+            "is_active": self.is_active,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "period": self.period,
+            "reset_day": self.reset_day,
+        })
+
+    def totals(self):
+        """What clients see: the limit, what is spent and what is left.
+
+        For a periodic budget these are the current period's figures.
+        """
+        if not self.period:
+            return {
+                "amount": self.amount,
+                "total_expenses": self.spent,
+                "remaining": self.remaining,
+                "expense_count": self.expense_count,
+                "is_active": self.is_active,
+            }
+        current = self.current
         return {
-            "_id": str(self.id),
-            "user_id": self.user_id,
-            "amount": self.amount
-        }
\ No newline at end of file
+            "amount": self.amount,
+            "total_expenses": current.spent if current else 0,
+            "remaining": self.remaining,
+            "expense_count": current.expense_count if current else 0,
+            "is_active": self.is_active,
+            "period": self.period,
+            "reset_day": self.reset_day,
+            "period_start": current.start if current else None,
+            "period_end": current.end if current else None,
+        }
+
+
+class PeriodModel:
+    """One budget period's rollup: what was spent from ``start`` up to ``end``.
+
+    ``amount`` is the limit copied from the budget, so a reservation can be
+    checked against it in the same update that records it. Closed periods
+    are recomputed from the expenses and ``sealed``.
+    """
+
+    __slots__ = ("id", "email", "period", "start", "end", "amount", "spent", "expense_count", "sealed")
+
+    def __init__(self, email, period, start, end, amount, spent=0, expense_count=0, sealed=False, id=None):
+        self.id = id
+        self.email = email
+        self.period = period
+        self.start = start
+        self.end = end
+        self.amount = amount
+        self.spent = spent
+        self.expense_count = expense_count
+        self.sealed = sealed
+
+    @classmethod
+    def from_doc(cls, doc):
+        period = cls.__new__(cls)
+        period.id = doc.get("_id")
+        period.email = doc.get("email")
+        period.period = doc.get("period")
+        period.start = doc.get("start")
+        period.end = doc.get("end")
+        period.amount = doc.get("amount")
+        period.spent = doc.get("spent", 0)
+        period.expense_count = doc.get("expense_count", 0)
+        period.sealed = doc.get("sealed", False)
+        return period
+
+    def to_doc(self):
+        return _compact({
+            "_id": self.id,
+            "email": self.email,
+            "period": self.period,
+            "start": self.start,
+            "end": self.end,
+            "amount": self.amount,
+            "spent": self.spent,
+            "expense_count": self.expense_count,
+            "sealed": self.sealed,
+        })
+
+
+class ExpenseBatch:
+    """Many expenses as parallel arrays instead of one object per row.
+
+    Amounts and timestamps (epoch seconds, NaN when not set yet) are packed
+    C doubles and categories are small integer codes into ``categories``, so
+    a batch costs a few bytes per expense plus its descriptions. Used by the
+    bulk import and analytics paths; NumPy can wrap the arrays without a copy.
+    """
+
+    __slots__ = ("user_id", "amounts", "timestamps", "codes", "categories", "descriptions", "_codes")
+
+    def __init__(self, user_id=None):
+        self.user_id = user_id
+        self.amounts = array("d")
+        self.timestamps = array("d")
+        self.codes = array("I")
+        self.categories = []
+        self.descriptions = []
+        self._codes = {}
+
+    @classmethod
+    def from_docs(cls, docs, user_id=None):
+        batch = cls(user_id)
+        for doc in docs:
+            created_at = doc.get("created_at")
+            batch.append(doc["amount"], doc.get("category"), doc.get("description") or "",
+                         epoch(created_at) if created_at else None)
+        return batch
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def _code(self, category):
+        code = self._codes.get(category)
+        if code is None:
+            code = self._codes[category] = len(self.categories)
+            self.categories.append(category)
+        return code
+
+    def append(self, amount, category=None, description="", timestamp=None):
+        self.amounts.append(amount)
+        self.timestamps.append(float("nan") if timestamp is None else timestamp)
+        self.codes.append(self._code(category or DEFAULT_CATEGORY))
+        self.descriptions.append(description)
+
+    def append_model(self, expense):
+        self.append(expense.amount, expense.category, expense.description,
+                    epoch(expense.created_at) if expense.created_at else None)
+
+    def total(self, indexes=None):
+        if indexes is None:
+            return sum(self.amounts)
+        return sum(self.amounts[i] for i in indexes)
+
+    def to_docs(self, created_at=None, generation=None):
+        """Expense documents ready for ``insert_many``.
+
+        ``created_at`` stamps every row; otherwise each row's own timestamp is used.
+        ``generation`` is the stored form from ``backend.purge.stored``.
+        """
+        docs = []
+        for i in range(len(self.amounts)):
+            if created_at is not None:
+                stamp = created_at
+            else:
+                stamp = datetime.fromtimestamp(self.timestamps[i], timezone.utc)
+            docs.append({
+                "user_id": self.user_id,
+                "amount": self.amounts[i],
+                "category": self.categories[self.codes[i]],
+                "description": self.descriptions[i],
+                "created_at": stamp,
+            })
+            if generation is not None:
+                docs[-1]["generation"] = generation
+        return docs
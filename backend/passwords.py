@@ -0,0 +1,107 @@
+# backend/passwords.py
+"""Password hashing on a bounded process pool.
+
+Hashing and verification are CPU-bound by design, so running them on the
+request threads lets a login storm starve every other endpoint. Here they
+run in worker processes instead. At most ``PASSWORD_POOL_MAX_PENDING`` jobs
+may be queued or running; past that ``HashingBusy`` is raised at once so
+the route can answer 503 instead of piling up threads.
+"""
+import multiprocessing
+import os
+import threading
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from .config import Config
+
+
+class HashingBusy(Exception):
+    """Too many hashing jobs are pending, or one did not finish in time."""
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(Config.PASSWORD_POOL_MAX_PENDING)
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                # spawn, not fork: forking a threaded server process is unsafe
+                _executor = ProcessPoolExecutor(
+                    max_workers=Config.PASSWORD_POOL_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                _executor_pid = pid
+    return _executor
+
+
+def _discard(executor):
+    """Drop ``executor`` after a worker died, so the next job gets a new pool."""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _run(fn, *args, **kwargs):
+    if Config.PASSWORD_POOL_WORKERS <= 0:
+        return fn(*args, **kwargs)
+    if not _pending.acquire(blocking=False):
+        raise HashingBusy("Password hashing pool is saturated")
+    executor = _get_executor()
+    try:
+        future = executor.submit(fn, *args, **kwargs)
+    except BaseException as e:
+        _pending.release()
+        if isinstance(e, BrokenProcessPool):
+            _discard(executor)
+            raise HashingBusy("Password hashing pool is restarting") from e
+        raise
+    # Held until the job is done, not just until we stop waiting for it
+    future.add_done_callback(lambda _: _pending.release())
+    try:
+        return future.result(timeout=Config.PASSWORD_POOL_TIMEOUT)
+    except TimeoutError:
+        future.cancel()
+        raise HashingBusy("Password hashing timed out")
+    except BrokenProcessPool as e:
+        _discard(executor)
+        raise HashingBusy("Password hashing pool is restarting") from e
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password, method=Config.PASSWORD_HASH_METHOD)
+
+
+def verify_password(stored_hash, password):
+    return _run(check_password_hash, stored_hash, password)
+
+
+@lru_cache(maxsize=None)
+def _full_method(method):
+    # Werkzeug fills in defaults ("scrypt" hashes as "scrypt:32768:8:1"), so
+    # compare against what a hash made with ``method`` actually starts with
+    return generate_password_hash("", method=method).split("$", 1)[0]
+
+
+def needs_rehash(stored_hash):
+    """True when ``stored_hash`` was made with a different method or cost."""
+    return stored_hash.split("$", 1)[0] != _full_method(Config.PASSWORD_HASH_METHOD)
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None and _executor_pid == os.getpid():
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
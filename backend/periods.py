@@ -0,0 +1,273 @@
+# backend/periods.py
+"""Monthly and weekly budgets, with one rollup document per period.
+
+A periodic budget's limit applies to each period on its own. What was spent
+in a period lives in a ``budget_periods`` document keyed by the user, the
+period kind and the period start. Every expense write ``$inc``s it, so the
+current period's totals are one point read. The limit is copied onto the
+rollup, which lets ``reserve`` check and record an expense in a single
+conditional update, as ``backend.ledger`` does for lifetime budgets.
+
+All periods are in UTC. A monthly period starts on its ``reset_day`` (1-28)
+of the month, a weekly one on its ``reset_day`` (0 is Monday) of the week.
+
+Once a period has ended, the job in this module recomputes it from the
+expenses and marks it ``sealed``; that fixes any drift. The job also
+backfills every period of a budget that just became periodic.
+``python -m backend.periods seal|backfill`` runs the same steps by hand.
+"""
+import argparse
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from backend import purge, repository
+from backend.config import Config
+from backend.database import budgets_collection, periods_collection
+from backend.models import BudgetModel, PeriodModel
+
+logger = logging.getLogger(__name__)
+
+
+def _utc(when):
+    # Datetimes read back from MongoDB are naive UTC
+    if when is None:
+        return datetime.now(timezone.utc)
+    return when if when.tzinfo else when.replace(tzinfo=timezone.utc)
+
+
+def period_bounds(period, reset_day, when=None):
+    """``(start, end)`` of the ``period`` that contains ``when`` (default now)."""
+    when = _utc(when)
+    if period == "weekly":
+        day = datetime(when.year, when.month, when.day, tzinfo=timezone.utc)
+        start = day - timedelta(days=(when.weekday() - reset_day) % 7)
+        return start, start + timedelta(days=7)
+    year, month = when.year, when.month
+    if when.day < reset_day:
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    start = datetime(year, month, reset_day, tzinfo=timezone.utc)
+    end = datetime(year + 1, 1, reset_day, tzinfo=timezone.utc) if month == 12 \
+        else datetime(year, month + 1, reset_day, tzinfo=timezone.utc)
+    return start, end
+
+
+def _key(budget, start):
+    return {"email": budget.email, "period": budget.period, "start": start}
+
+
+def reserve(budget, amount, count=1, when=None):
+    """Add ``amount`` to the period containing ``when`` if it stays within the limit.
+
+    Returns the updated ``PeriodModel``, or ``None`` if there is not enough
+    left in the period.
+    """
+    start, end = period_bounds(budget.period, budget.reset_day, when)
+    for _ in range(2):
+        doc = periods_collection.find_one_and_update(
+            dict(_key(budget, start), **{
+                "$expr": {"$lte": [{"$add": ["$spent", amount]}, "$amount"]},
+            }),
+            {"$inc": {"spent": amount, "expense_count": count},
+             "$set": {"updated_at": datetime.now(timezone.utc)}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc:
+            return PeriodModel.from_doc(doc)
+        # Either the period is full or its first expense is still to come
+        try:
+            created = periods_collection.update_one(
+                _key(budget, start),
+                {"$setOnInsert": {"end": end, "amount": budget.amount, "spent": 0,
+                                  "expense_count": 0, "sealed": False}},
+                upsert=True,
+            ).upserted_id
+        except DuplicateKeyError:
+            created = True
+        if not created:
+            return None
+    return None
+
+
+def release(budget, amount, count=1, when=None):
+    """Give ``amount`` back to the period containing ``when``.
+
+    Returns the updated ``PeriodModel``, or ``None`` if that period has no rollup.
+    """
+    start, _ = period_bounds(budget.period, budget.reset_day, when)
+    doc = periods_collection.find_one_and_update(
+        _key(budget, start),
+        {"$inc": {"spent": -amount, "expense_count": -count},
+         "$set": {"updated_at": datetime.now(timezone.utc)}},
+        return_document=ReturnDocument.AFTER,
+    )
+    return PeriodModel.from_doc(doc) if doc else None
+
+
+def load_current(budget, now=None):
+    """The budget's current ``PeriodModel``, or ``None`` for a lifetime budget.
+
+    A period nobody has spent in yet has no document and reads as empty.
+    """
+    if budget is None or not budget.period:
+        return None
+    start, end = period_bounds(budget.period, budget.reset_day, now)
+    doc = periods_collection.find_one(_key(budget, start))
+    if doc:
+        return PeriodModel.from_doc(doc)
+    return PeriodModel(budget.email, budget.period, start, end, budget.amount)
+
+
+def is_current(period, now=None):
+    """Whether ``now`` falls inside ``period`` (a ``PeriodModel``)."""
+    now = _utc(now)
+    return _utc(period.start) <= now < _utc(period.end)
+
+
+def with_current(budget):
+    """``budget`` with its current period attached, ready for ``totals``."""
+    if budget is None or not budget.period:
+        return budget
+    return budget.with_current(load_current(budget))
+
+
+def set_amount(email, amount):
+    """Carry a new limit over to the periods that are still open."""
+    periods_collection.update_many({"email": email, "sealed": False}, {"$set": {"amount": amount}})
+
+
+def _tally(email, start, end):
+    repo, gen = repository.for_user(email)
+    return repo.totals(purge.live(email, gen), start, end)
+
+
+def backfill(budget, since=None, now=None):
+    """Rebuild the budget's rollups from its live expenses, from ``since`` (or
+    its first expense) up to the current period. Returns how many were written.
+
+    Ended periods come out sealed. An expense written while this runs can be
+    lost from the current period's rollup, which sealing corrects once the
+    period is over.
+    """
+    now = _utc(now)
+    repo, gen = repository.for_user(budget.email)
+    live = purge.live(budget.email, gen)
+    if since is None:
+        first = next(iter(repo.find(live, ("created_at",), limit=1)), None)
+        since = first["created_at"] if first else now
+    boundaries = [period_bounds(budget.period, budget.reset_day, since)[0]]
+    while boundaries[-1] <= now:
+        boundaries.append(period_bounds(budget.period, budget.reset_day, boundaries[-1])[1])
+
+    totals = {}
+    for row in repo.aggregate(live, [
+        {"$bucket": {"groupBy": "$created_at", "boundaries": boundaries,
+                     "output": {"spent": {"$sum": "$amount"}, "expense_count": {"$sum": 1}}}},
+    ], boundaries[0], boundaries[-1]):
+        totals[_utc(row["_id"])] = row
+
+    written = 0
+    for start, end in zip(boundaries, boundaries[1:]):
+        row = totals.get(start)
+        if row is None and end <= now:
+            continue
+        periods_collection.update_one(
+            _key(budget, start),
+            {"$set": {"end": end, "amount": budget.amount, "sealed": end <= now,
+                      "spent": row["spent"] if row else 0,
+                      "expense_count": row["expense_count"] if row else 0,
+                      "updated_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+        written += 1
+    return written
+
+
+def seal(now=None):
+    """Recompute every ended, unsealed period from the expenses and seal it.
+
+    Returns how many were sealed.
+    """
+    now = _utc(now)
+    sealed = 0
+    for doc in periods_collection.find({"sealed": False, "end": {"$lte": now}}):
+        period = PeriodModel.from_doc(doc)
+        periods_collection.update_one(
+            {"_id": period.id},
+            {"$set": dict(_tally(period.email, period.start, period.end), sealed=True,
+                          updated_at=datetime.now(timezone.utc))},
+        )
+        sealed += 1
+    return sealed
+
+
+def backfill_pending(now=None):
+    """Backfill the periodic budgets not backfilled since they got their period."""
+    done = 0
+    for doc in budgets_collection.find({"period": {"$ne": None}, "periods_backfilled_at": None}):
+        budget = BudgetModel.from_doc(doc)
+        backfill(budget, now=now)
+        budgets_collection.update_one(
+            {"_id": budget.id, "period": budget.period, "reset_day": budget.reset_day},
+            {"$set": {"periods_backfilled_at": datetime.now(timezone.utc)}},
+        )
+        done += 1
+    return done
+
+
+def run_once(now=None):
+    """One pass of the job: backfill new periodic budgets, then seal ended periods."""
+    return {"backfilled": backfill_pending(now), "sealed": seal(now)}
+
+
+def run_forever(interval=None):
+    interval = interval or Config.PERIOD_JOB_INTERVAL
+    while True:
+        try:
+            result = run_once()
+            if any(result.values()):
+                logger.info("Budget periods: backfilled %(backfilled)d budget(s), sealed %(sealed)d period(s)",
+                            result)
+        except PyMongoError as e:
+            logger.warning("Budget period job failed, retrying: %s", e)
+        time.sleep(interval)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def start_worker():
+    """Run the period job on a daemon thread in this process, once."""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=run_forever, name="period-job", daemon=True)
+            _worker.start()
+    return _worker
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain budget period rollups.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("seal", help="recompute and seal every period that has ended")
+    backfill_cmd = commands.add_parser("backfill", help="rebuild rollups from the expenses collection")
+    backfill_cmd.add_argument("--email", help="only backfill this user")
+    args = parser.parse_args(argv)
+
+    if args.command == "seal":
+        print(f"Sealed {seal()} period(s)")
+    elif args.command == "backfill":
+        query = {"period": {"$ne": None}}
+        if args.email:
+            query["email"] = args.email
+        written = sum(backfill(BudgetModel.from_doc(doc)) for doc in budgets_collection.find(query))
+        print(f"Backfilled {written} period(s)")
+
+
+if __name__ == "__main__":
+    main()
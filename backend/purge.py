@@ -0,0 +1,214 @@
+# backend/purge.py
+"""Resetting a user's data and deleting expenses without deleting them inline.
+
+Every expense belongs to a generation of its owner's data. The live one is
+``generation`` on the user document (0, stored on expenses as a missing
+field, for users who never reset), and every read filters on it through
+``live``. A reset bumps the counter, so the user's whole history drops out of
+reads in one single-document write. A purge job then deletes the old
+generations in bounded, rate-limited batches from a background worker,
+coordinated across processes through a lease on the job document.
+
+Deleting one expense moves it to the ``DELETED`` generation and stamps
+``deleted_at``. The TTL index on that field removes it later. That is for
+the documents layout; the bucket layout drops a deleted expense at once
+(see ``backend.repository``), and the purge worker clears both.
+
+``python -m backend.purge`` runs the worker in the foreground, for
+deployments that keep it out of the API processes.
+"""
+import argparse
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from backend import budget_cache, metrics
+from backend.config import Config
+from backend.database import (budgets_collection, expenses_collection, purges_collection,
+                              periods_collection, tombstones_collection, users_collection)
+
+logger = logging.getLogger(__name__)
+
+# Generation of soft-deleted expenses; live generations are never negative
+DELETED = -1
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+purged_expenses = metrics.Counter("purged_expenses_total", "Expenses from reset generations deleted by the purge worker")
+
+
+def generation(email):
+    """The user's live generation."""
+    user = users_collection.find_one({"email": email}, {"generation": 1})
+    return (user or {}).get("generation", 0)
+
+
+def stored(gen):
+    """How ``gen`` is written on expenses: generation 0 is left out."""
+    return gen or None
+
+
+def live(email, gen=None):
+    """Filter matching the user's live expenses; looks the generation up unless given."""
+    if gen is None:
+        gen = generation(email)
+    # Equality with None also matches expenses written before generations existed
+    return {"user_id": email, "generation": stored(gen)}
+
+
+def stale(email, gen):
+    """Filter matching the expenses of ``email`` from generations before ``gen``.
+
+    Generations only grow, so a worker holding an outdated ``gen`` can leave
+    some work behind but never match anything live.
+    """
+    if not gen:
+        return {"user_id": email, "generation": DELETED}
+    return {"user_id": email, "$or": [{"generation": {"$lt": gen}}, {"generation": None}]}
+
+
+def reset(email):
+    """Drop all of a user's expenses and zero their budget, right away for reads.
+
+    The budget stays, inactive and with empty counters, so its ``version``
+    keeps rising and no old ETag can match again. Returns the new
+    generation, or ``None`` if there is no such user.
+    """
+    user = users_collection.find_one_and_update(
+        {"email": email}, {"$inc": {"generation": 1}},
+        projection={"generation": 1}, return_document=ReturnDocument.AFTER,
+    )
+    if user is None:
+        return None
+
+    now = datetime.now(timezone.utc)
+    budgets_collection.update_one(
+        {"email": email},
+        {"$set": {"spent": 0, "expense_count": 0, "is_active": False, "updated_at": now},
+         "$inc": {"version": 1}},
+    )
+    # Period rollups are cheap to rebuild and all belong to the old generation
+    periods_collection.delete_many({"email": email})
+    budget_cache.invalidate(email)
+    # Imported here: the repositories build on this module
+    from backend.repository import invalidate
+    invalidate(email)
+    # An expense_id of None tells syncing WebSocket clients to start over
+    tombstones_collection.insert_one({"user_id": email, "expense_id": None, "deleted_at": now})
+    purges_collection.update_one(
+        {"_id": email},
+        {"$set": {"requested_at": now}, "$setOnInsert": {"lease_until": EPOCH}},
+        upsert=True,
+    )
+    return user["generation"]
+
+
+def soft_delete(email, expense_id, gen=None):
+    """Take one live expense out of reads. Returns its document (``amount`` and
+    ``created_at`` only) or ``None``."""
+    return expenses_collection.find_one_and_update(
+        dict(live(email, gen), _id=expense_id),
+        {"$set": {"generation": DELETED, "deleted_at": datetime.now(timezone.utc)}},
+        projection={"amount": 1, "created_at": 1},
+    )
+
+
+class Purger:
+    """Deletes stale generations job by job, at most ``rate`` expenses a second."""
+
+    def __init__(self, batch_size=None, rate=None, lease_seconds=None):
+        self.batch_size = batch_size or Config.PURGE_BATCH_SIZE
+        self.rate = Config.PURGE_RATE if rate is None else rate
+        self.lease = timedelta(seconds=lease_seconds or Config.PURGE_LEASE_SECONDS)
+
+    def _claim(self):
+        now = datetime.now(timezone.utc)
+        return purges_collection.find_one_and_update(
+            {"lease_until": {"$lt": now}},
+            {"$set": {"lease_until": now + self.lease}},
+            sort=[("lease_until", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def purge_user(self, email):
+        """Delete everything older than the user's live generation; returns how many."""
+        # Imported here: the repositories build on this module
+        from backend.repository import LAYOUTS
+
+        gen = generation(email)
+        deleted = 0
+        # A user being migrated has expenses in both layouts
+        for repo in LAYOUTS.values():
+            while True:
+                documents, count = repo.purge_batch(stale(email, gen), self.batch_size)
+                if not documents:
+                    break
+                deleted += count
+                purged_expenses.inc(amount=count)
+                purges_collection.update_one(
+                    {"_id": email}, {"$set": {"lease_until": datetime.now(timezone.utc) + self.lease}})
+                if self.rate > 0:
+                    time.sleep(count / self.rate)
+        return deleted
+
+    def run_once(self):
+        """Finish one job. Returns ``False`` when there was nothing to claim."""
+        job = self._claim()
+        if job is None:
+            return False
+        deleted = self.purge_user(job["_id"])
+        # A reset that landed meanwhile changed requested_at; leave its job for the next pass
+        done = purges_collection.delete_one({"_id": job["_id"], "requested_at": job["requested_at"]}).deleted_count
+        if not done:
+            purges_collection.update_one({"_id": job["_id"]}, {"$set": {"lease_until": EPOCH}})
+        logger.info("Purged %d expenses of %s", deleted, job["_id"])
+        return True
+
+    def run_forever(self, poll_interval=None):
+        poll_interval = poll_interval or Config.PURGE_POLL_INTERVAL
+        while True:
+            try:
+                busy = self.run_once()
+            except PyMongoError as e:
+                logger.warning("Purge failed, retrying: %s", e)
+                busy = False
+            if not busy:
+                time.sleep(poll_interval)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def start_worker():
+    """Run a ``Purger`` on a daemon thread in this process, once."""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=Purger().run_forever, name="purge-worker", daemon=True)
+            _worker.start()
+    return _worker
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Purge expenses left behind by resets.")
+    parser.add_argument("--once", action="store_true", help="drain the pending jobs and exit")
+    parser.add_argument("--rate", type=float, help="expenses per second (0 for no limit)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    purger = Purger(rate=args.rate)
+    if args.once:
+        jobs = 0
+        while purger.run_once():
+            jobs += 1
+        print(f"Finished {jobs} purge job(s)")
+    else:
+        purger.run_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+# backend/repository.py
+"""Where expenses are stored: one document each, or bucketed by month.
+
+``DocumentRepository`` is the original layout, one ``expenses`` document per
+expense. ``BucketRepository`` keeps one ``expense_buckets`` document per
+user, generation and month, holding that month's expenses in an embedded
+array next to their precomputed ``count`` and ``sum``. A month of history is
+then one document (or a few) instead of thousands, and totals over whole
+months never read the expenses at all. A bucket only takes expenses that
+keep it within ``BUCKET_MAX_EXPENSES`` expenses and ``BUCKET_MAX_BYTES`` of
+them; when none has room, the expense starts a new one.
+
+Both layouts take the filters ``backend.purge`` builds (on ``user_id`` and
+``generation``) and hand back plain expense documents, so callers do not
+care which one holds a user's data. ``for_user`` picks it: the ``storage``
+field on the user document, which ``backend.migrate`` sets, or
+``EXPENSE_STORAGE`` for users without one. It is cached per worker with
+the user's live generation, since nearly every request needs both.
+"""
+import itertools
+import threading
+from datetime import datetime, timezone
+
+import bson
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from backend import purge
+from backend.cache import LRUCache
+from backend.config import Config
+from backend.database import buckets_collection, expenses_collection, users_collection
+from backend.invalidation import get_channel
+
+
+def _utc(when):
+    # Datetimes read back from MongoDB are naive UTC
+    return when if when.tzinfo else when.replace(tzinfo=timezone.utc)
+
+
+def month_of(when):
+    """Start of the UTC month containing ``when``."""
+    when = _utc(when)
+    return datetime(when.year, when.month, 1, tzinfo=timezone.utc)
+
+
+def next_month(month):
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def _date_range(match, start=None, end=None):
+    query = dict(match)
+    if start or end:
+        query["created_at"] = {}
+        if start:
+            query["created_at"]["$gte"] = start
+        if end:
+            query["created_at"]["$lt"] = end
+    return query
+
+
+class ExpenseRepository:
+    """Interface both storage layouts implement.
+
+    ``match`` is always a filter on ``user_id`` and ``generation`` only.
+    Expenses come back ordered by ``(created_at, _id)``; ``after`` is such a
+    pair, and only expenses past it in that order are returned.
+    """
+
+    name = None
+
+    def insert(self, doc):
+        """Write one expense document; returns its ``_id``."""
+        raise NotImplementedError
+
+    def insert_many(self, docs):
+        """Write many expenses, unordered; returns their ids.
+
+        Raises ``BulkWriteError`` whose ``writeErrors`` are indexed by position
+        in ``docs``, like ``insert_many``.
+        """
+        raise NotImplementedError
+
+    def find(self, match, fields, start=None, end=None, after=None, descending=False, limit=None,
+             batch_size=None):
+        """Expenses matching ``match`` created in ``[start, end)``, with ``fields`` (and ``_id``)."""
+        raise NotImplementedError
+
+    def aggregate(self, match, stages, start=None, end=None):
+        """Run ``stages`` over the matching expenses as if each were its own document."""
+        raise NotImplementedError
+
+    def totals(self, match, start=None, end=None):
+        """``{"spent": ..., "expense_count": ...}`` over the matching expenses."""
+        row = next(self.aggregate(match, [
+            {"$group": {"_id": None, "spent": {"$sum": "$amount"}, "expense_count": {"$sum": 1}}},
+        ], start, end), {"spent": 0, "expense_count": 0})
+        return {"spent": row["spent"], "expense_count": row["expense_count"]}
+
+    def soft_delete(self, email, expense_id, gen=None):
+        """Take one live expense out of reads. Returns its ``_id``, ``amount`` and
+        ``created_at``, or ``None`` if the user has no such live expense."""
+        raise NotImplementedError
+
+    def purge_batch(self, match, batch_size):
+        """Delete up to ``batch_size`` expenses matching ``match``.
+
+        Returns ``(documents, expenses)`` deleted; ``(0, 0)`` when none are left.
+        """
+        raise NotImplementedError
+
+
+class DocumentRepository(ExpenseRepository):
+    """One ``expenses`` document per expense."""
+
+    name = "documents"
+    collection = expenses_collection
+
+    def insert(self, doc):
+        return self.collection.insert_one(doc).inserted_id
+
+    def insert_many(self, docs):
+        return self.collection.insert_many(docs, ordered=False).inserted_ids
+
+    def find(self, match, fields, start=None, end=None, after=None, descending=False, limit=None,
+             batch_size=None):
+        query = _date_range(match, start, end)
+        if after:
+            created_at, expense_id = after
+            op = "$lt" if descending else "$gt"
+            query["$or"] = [
+                {"created_at": {op: created_at}},
+                {"created_at": created_at, "_id": {op: expense_id}},
+            ]
+        direction = -1 if descending else 1
+        cursor = self.collection.find(query, dict.fromkeys(fields, 1)).sort([("created_at", direction),
+                                                                             ("_id", direction)])
+        if limit:
+            cursor = cursor.limit(limit)
+        if batch_size:
+            cursor = cursor.batch_size(batch_size)
+        return cursor
+
+    def aggregate(self, match, stages, start=None, end=None):
+        return self.collection.aggregate([{"$match": _date_range(match, start, end)}] + stages)
+
+    def soft_delete(self, email, expense_id, gen=None):
+        return purge.soft_delete(email, expense_id, gen)
+
+    def purge_batch(self, match, batch_size):
+        ids = [doc["_id"] for doc in self.collection.find(match, {"_id": 1}).limit(batch_size)]
+        if not ids:
+            return 0, 0
+        # Stale expenses never become live again, so the ids alone are enough
+        count = self.collection.delete_many({"_id": {"$in": ids}}).deleted_count
+        return count, count
+
+
+class BucketRepository(ExpenseRepository):
+    """One ``expense_buckets`` document per user, generation and month."""
+
+    name = "buckets"
+    collection = buckets_collection
+    # What each embedded expense keeps; user_id and generation live on the bucket
+    EMBEDDED = ("_id", "amount", "category", "description", "created_at")
+
+    def __init__(self, max_expenses=None, max_bytes=None):
+        self.max_expenses = max_expenses or Config.BUCKET_MAX_EXPENSES
+        self.max_bytes = max_bytes or Config.BUCKET_MAX_BYTES
+
+    def _entry(self, doc):
+        expense = {field: doc[field] for field in self.EMBEDDED if field in doc}
+        return expense, len(bson.encode(expense))
+
+    def _push(self, key, entries):
+        """Push ``entries`` (``(expense, size)`` pairs) into a bucket they all fit in."""
+        user_id, generation, month = key
+        size = sum(entry[1] for entry in entries)
+        return UpdateOne(
+            {"user_id": user_id, "generation": generation, "month": month,
+             "count": {"$lte": self.max_expenses - len(entries)}, "bytes": {"$lte": self.max_bytes - size}},
+            {"$push": {"expenses": {"$each": [entry[0] for entry in entries]}},
+             "$inc": {"count": len(entries), "sum": sum(entry[0]["amount"] for entry in entries), "bytes": size}},
+            upsert=True,
+        )
+
+    def _chunks(self, indexes, entries):
+        """Split ``indexes`` into runs whose entries fit in one empty bucket."""
+        chunk, size = [], 0
+        for index in indexes:
+            if chunk and (len(chunk) == self.max_expenses or size + entries[index][1] > self.max_bytes):
+                yield chunk
+                chunk, size = [], 0
+            chunk.append(index)
+            size += entries[index][1]
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def _key(doc):
+        doc.setdefault("_id", ObjectId())
+        return doc["user_id"], doc.get("generation"), month_of(doc["created_at"])
+
+    def insert(self, doc):
+        self.collection.bulk_write([self._push(self._key(doc), [self._entry(doc)])])
+        return doc["_id"]
+
+    def insert_many(self, docs):
+        groups = {}
+        for index, doc in enumerate(docs):
+            groups.setdefault(self._key(doc), []).append(index)
+        entries = [self._entry(doc) for doc in docs]
+        ops, members = [], []
+        for key, indexes in groups.items():
+            for chunk in self._chunks(indexes, entries):
+                ops.append(self._push(key, [entries[j] for j in chunk]))
+                members.append(chunk)
+        try:
+            self.collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            # A failed push fails every expense in it; report them by their own index
+            errors = [dict(error, index=j) for error in e.details["writeErrors"] for j in members[error["index"]]]
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(docs) - len(errors)})
+        return [doc["_id"] for doc in docs]
+
+    def _bucket_range(self, match, start=None, end=None):
+        query = dict(match)
+        if start or end:
+            query["month"] = {}
+            if start:
+                query["month"]["$gte"] = month_of(start)
+            if end:
+                query["month"]["$lt"] = end
+        return query
+
+    def find(self, match, fields, start=None, end=None, after=None, descending=False, limit=None,
+             batch_size=None):
+        query = self._bucket_range(match, start, end)
+        if after:
+            after = (_utc(after[0]), after[1])
+            months = query.setdefault("month", {})
+            if descending:
+                months["$lte"] = month_of(after[0])
+            else:
+                months["$gte"] = max(month_of(after[0]), months.get("$gte", month_of(after[0])))
+        start = start and _utc(start)
+        end = end and _utc(end)
+        buckets = self.collection.find(query, {"month": 1, "expenses": 1, "user_id": 1, "generation": 1}) \
+            .sort([("month", -1 if descending else 1)])
+        if batch_size:
+            buckets = buckets.batch_size(max(1, batch_size // self.max_expenses))
+        return self._iter_expenses(buckets, fields, start, end, after, descending, limit)
+
+    @staticmethod
+    def _iter_expenses(buckets, fields, start, end, after, descending, limit):
+        sent = 0
+        # Buckets of one month can hold interleaved expenses, so each month is sorted as a whole
+        for _, month in itertools.groupby(buckets, key=lambda bucket: bucket["month"]):
+            rows = []
+            for bucket in month:
+                for expense in bucket["expenses"]:
+                    rows.append(((_utc(expense["created_at"]), expense["_id"]), bucket, expense))
+            rows.sort(key=lambda row: row[0], reverse=descending)
+            for key, bucket, expense in rows:
+                if (start and key[0] < start) or (end and key[0] >= end):
+                    continue
+                if after and (key >= after if descending else key <= after):
+                    continue
+                doc = dict(expense, user_id=bucket["user_id"], generation=bucket.get("generation"))
+                yield {field: doc[field] for field in set(fields) | {"_id"} if doc.get(field) is not None}
+                sent += 1
+                if limit and sent >= limit:
+                    return
+
+    def _unwound(self, query):
+        return [
+            {"$match": query},
+            {"$unwind": "$expenses"},
+            {"$addFields": {"expenses.user_id": "$user_id", "expenses.generation": "$generation"}},
+            {"$replaceRoot": {"newRoot": "$expenses"}},
+        ]
+
+    def aggregate(self, match, stages, start=None, end=None):
+        pipeline = self._unwound(self._bucket_range(match, start, end))
+        if start or end:
+            pipeline.append({"$match": _date_range({}, start, end)})
+        return self.collection.aggregate(pipeline + stages)
+
+    def totals(self, match, start=None, end=None):
+        """Whole months in the range are summed from the buckets' own counters;
+        only the partial months at either end are unwound."""
+        edges = []
+        whole = dict(match)
+        if start or end:
+            whole["month"] = {}
+        if start:
+            first = month_of(start)
+            if first != _utc(start):
+                edges.append(first)
+                first = next_month(first)
+            whole["month"]["$gte"] = first
+        if end:
+            last = month_of(end)
+            if last != _utc(end):
+                edges.append(last)
+            whole["month"]["$lt"] = last
+
+        spent, count = 0, 0
+        for row in self.collection.aggregate([
+            {"$match": whole},
+            {"$group": {"_id": None, "spent": {"$sum": "$sum"}, "expense_count": {"$sum": "$count"}}},
+        ]):
+            spent, count = row["spent"], row["expense_count"]
+        if edges:
+            pipeline = self._unwound(dict(match, month={"$in": sorted(set(edges))}))
+            pipeline += [
+                {"$match": _date_range({}, start, end)},
+                {"$group": {"_id": None, "spent": {"$sum": "$amount"}, "expense_count": {"$sum": 1}}},
+            ]
+            for row in self.collection.aggregate(pipeline):
+                spent += row["spent"]
+                count += row["expense_count"]
+        return {"spent": spent, "expense_count": count}
+
+    def remove(self, match, expense_id):
+        """Pull one expense out of whichever matching bucket holds it; returns it or ``None``."""
+        bucket = self.collection.find_one(dict(match, **{"expenses._id": expense_id}),
+                                          {"expenses": {"$elemMatch": {"_id": expense_id}}})
+        if bucket is None:
+            return None
+        expense = bucket["expenses"][0]
+        # Matching on the expense too means a concurrent delete cannot take it twice
+        pulled = self.collection.update_one(
+            {"_id": bucket["_id"], "expenses._id": expense_id},
+            {"$pull": {"expenses": {"_id": expense_id}},
+             "$inc": {"count": -1, "sum": -expense["amount"], "bytes": -self._entry(expense)[1]}},
+        ).modified_count
+        if not pulled:
+            return None
+        self.collection.delete_one({"_id": bucket["_id"], "count": 0})
+        return {"_id": expense_id, "amount": expense["amount"], "created_at": expense["created_at"]}
+
+    def soft_delete(self, email, expense_id, gen=None):
+        # Nothing to keep around: unlike documents, buckets drop the expense at once
+        return self.remove(purge.live(email, gen), expense_id)
+
+    def purge_batch(self, match, batch_size):
+        buckets = list(self.collection.find(match, {"count": 1}).limit(max(1, batch_size // self.max_expenses)))
+        if not buckets:
+            return 0, 0
+        deleted = self.collection.delete_many({"_id": {"$in": [bucket["_id"] for bucket in buckets]}}).deleted_count
+        return deleted, sum(bucket.get("count", 0) for bucket in buckets)
+
+
+LAYOUTS = {repository.name: repository for repository in (DocumentRepository(), BucketRepository())}
+
+TOPIC = "users"
+# email -> (storage, generation) from the user document; dropped on resets and
+# migrations, and the TTL is the longest a worker can miss one
+_users = LRUCache(Config.USER_CACHE_SIZE, ttl=Config.USER_CACHE_TTL)
+# Bumped on every drop; a read that raced one does not store what it read
+_drops = 0
+_drops_lock = threading.Lock()
+_subscribed = False
+
+
+def get(name=None):
+    """The repository for layout ``name``, by default ``EXPENSE_STORAGE``."""
+    return LAYOUTS[name or Config.EXPENSE_STORAGE]
+
+
+def _forget(key):
+    global _drops
+    with _drops_lock:
+        _drops += 1
+    if key is None:
+        _users.clear()
+    else:
+        _users.pop(key)
+
+
+def _channel():
+    global _subscribed
+    channel = get_channel()
+    if not _subscribed:
+        with _drops_lock:
+            if not _subscribed:
+                channel.subscribe(TOPIC, _forget)
+                _subscribed = True
+    return channel
+
+
+def for_user(email):
+    """``(repository, live generation)`` for a user, cached per worker."""
+    _channel()
+    entry = _users.get(email)
+    if entry is None:
+        drops = _drops
+        user = users_collection.find_one({"email": email}, {"generation": 1, "storage": 1}) or {}
+        entry = (user.get("storage"), user.get("generation", 0))
+        with _drops_lock:
+            if drops == _drops:
+                _users.set(email, entry)
+    return get(entry[0]), entry[1]
+
+
+def invalidate(email):
+    """Drop the cached layout and generation of ``email`` in every worker."""
+    _channel().publish(TOPIC, email)
@@ -0,0 +1,69 @@
+from flask import Blueprint, request, jsonify, current_app, g
+from backend.auth import require_auth
+from backend import analytics
+from datetime import datetime, timezone
+
+analytics_bp = Blueprint("analytics", __name__)
+
+MAX_TOP = 100
+MAX_RANGES = 24
+
+def parse_date(value):
+    """ISO 8601 date or datetime, read as UTC unless it carries an offset."""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+@analytics_bp.route("/analytics/<email>", methods=["GET"])
+@require_auth
+def get_analytics(email):
+    if g.user_email != email:
+        return jsonify({"message": "Unauthorized", "status": "error"}), 401
+
+    granularity = request.args.get("granularity", "day")
+    if granularity not in analytics.GRANULARITY_FORMATS:
+        return jsonify({"error": f"granularity must be one of: {', '.join(analytics.GRANULARITY_FORMATS)}"}), 400
+
+    try:
+        top = int(request.args.get("top", 10))
+        if not 0 < top <= MAX_TOP:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": f"top must be between 1 and {MAX_TOP}"}), 400
+
+    try:
+        start = parse_date(request.args["start"]) if request.args.get("start") else None
+        end = parse_date(request.args["end"]) if request.args.get("end") else None
+        # ranges=2024-01-01..2024-02-01,2024-02-01..2024-03-01 (start inclusive, end exclusive)
+        ranges = [
+            tuple(parse_date(part) for part in item.split(".."))
+            for item in request.args.get("ranges", "").split(",") if item
+        ]
+        if any(len(r) != 2 or r[0] >= r[1] for r in ranges):
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "Dates must be ISO 8601 and ranges written as start..end"}), 400
+    if len(ranges) > MAX_RANGES:
+        return jsonify({"error": f"At most {MAX_RANGES} ranges per request"}), 400
+
+    key = (request.args.get("start"), request.args.get("end"), granularity, top, request.args.get("ranges"))
+    try:
+        def compute():
+            result = analytics.summarize(email, start, end, granularity, top)
+            if ranges:
+                result["ranges"] = analytics.compare_ranges(email, ranges)
+            return result
+
+        result = analytics.cached(email, key, compute)
+        return jsonify({
+            "message": "Analytics retrieved successfully",
+            "start": start,
+            "end": end,
+            "granularity": granularity,
+            **result
+        }), 200
+
+    except Exception as e:
+        current_app.logger.error(f"Error computing analytics: {str(e)}")
+        return jsonify({"error": f"Server error: {str(e)}"}), 500
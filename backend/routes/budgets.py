@@ -1,64 +1,82 @@
-from flask import Blueprint, request, jsonify, current_app
-from backend.database import budgets_collection, expenses_collection
-from backend.auth import decode_jwt, AuthError
+from flask import Blueprint, request, jsonify, current_app, g
+from backend.database import budgets_collection
+from backend.auth import require_auth
+from backend import ledger, analytics, events, budget_cache, periods, repository
+from backend.conditional import conditional
+from backend.models import BudgetModel, ValidationError, parse_amount, parse_period
 from bson.objectid import ObjectId
+from pymongo import ReturnDocument
 from pymongo.errors import OperationFailure
 from datetime import datetime, timezone
 
-BEARER_PREFIX = "Bearer "
-
 budgets_bp = Blueprint("budgets", __name__)
 
 @budgets_bp.route("/budgets", methods=["POST"])
+@require_auth
 def create_or_update_budget():
-    try:
-        token = request.headers.get("Authorization").split(BEARER_PREFIX)[1]
-        payload = decode_jwt(token)
-        user_email = payload["email"]
-    except (AuthError, IndexError, AttributeError) as e:
-        return jsonify({"message": "Unauthorized", "status": "error"}), 401
+    user_email = g.user_email
 
     data = request.get_json()
-    
-    required_fields = ["amount"]
-    if not data or any(field not in data for field in required_fields):
-        return jsonify({"error": f"Missing required field: {', '.join(required_fields)}"}), 400
 
     try:
-        amount = float(data["amount"])
-        if amount <= 0:
-            return jsonify({"error": "Amount must be greater than zero"}), 400
-    except ValueError:
-        return jsonify({"error": "Invalid amount format"}), 400
+        amount = parse_amount(data.get("amount") if isinstance(data, dict) else None)
+        # Leaving period out keeps the current one; new budgets default to lifetime
+        period_given = "period" in data
+        period, reset_day = parse_period(data)
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
 
     try:
         existing_budget = budgets_collection.find_one({"email": user_email})
 
         current_timestamp = datetime.now(timezone.utc)
-        budget_data = {
-            "email": user_email,
-            "amount": amount,
-            "updated_at": current_timestamp
-        }
 
         if existing_budget:
-            result = budgets_collection.update_one(
-                {"email": user_email},
-                {"$set": budget_data},
-                upsert=False
+            update = {"$set": {"amount": amount, "is_active": True, "updated_at": current_timestamp},
+                      "$inc": {"version": 1}}
+            period_changed = period_given and (period, reset_day) != (existing_budget.get("period"),
+                                                                      existing_budget.get("reset_day"))
+            if period_changed:
+                update["$set"].update(period=period, reset_day=reset_day)
+                # The period job backfills the earlier periods under the new settings
+                update["$unset"] = {"periods_backfilled_at": ""}
+            updated_budget = budgets_collection.find_one_and_update(
+                # Setting an amount (re)activates a budget that was deleted or reset
+                {"email": user_email}, update,
+                return_document=ReturnDocument.AFTER
             )
-            if result.modified_count > 0:
-                return jsonify({"message": "Budget updated successfully", "amount": amount}), 200
+            if updated_budget:
+                budget = BudgetModel.from_doc(ledger.seed(updated_budget))
+                periods.set_amount(user_email, amount)
+                if period_changed and budget.period:
+                    periods.backfill(budget, since=current_timestamp)
+                budget_cache.invalidate(user_email)
+                # Adds resume once the budget is active again; none may go to a generation a reset retired
+                repository.invalidate(user_email)
+                analytics.invalidate(user_email)
+                events.publish(user_email, events.BUDGET_CHANGED,
+                               budget=events.budget_totals(periods.with_current(budget)))
+                return jsonify({"message": "Budget updated successfully", "amount": amount,
+                                "period": budget.period}), 200
             else:
                 return jsonify({"error": "Failed to update budget"}), 500
         else:
-            budget_data["created_at"] = current_timestamp
-            budget_data["is_active"] = True
-            inserted_budget = budgets_collection.insert_one(budget_data)
+            budget = BudgetModel(user_email, amount, created_at=current_timestamp,
+                                 updated_at=current_timestamp, period=period, reset_day=reset_day,
+                                 **ledger.tally(user_email))
+            inserted_budget = budgets_collection.insert_one(budget.to_doc())
+            if budget.period:
+                periods.backfill(budget, since=current_timestamp)
+            budget_cache.invalidate(user_email)
+            repository.invalidate(user_email)
+            analytics.invalidate(user_email)
+            events.publish(user_email, events.BUDGET_CHANGED,
+                           budget=events.budget_totals(periods.with_current(budget)))
             return jsonify({
                 "message": "Budget created successfully",
-                "budget_id": str(inserted_budget.inserted_id),
-                "amount": amount
+                "budget_id": inserted_budget.inserted_id,
+                "amount": amount,
+                "period": period
             }), 201
 
     except OperationFailure as e:
@@ -67,43 +85,36 @@ def create_or_update_budget():
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
 @budgets_bp.route("/budgets/<email>", methods=["GET"])
+@require_auth
+@conditional
 def get_budget(email):
-    try:
-        token = request.headers.get("Authorization").split(BEARER_PREFIX)[1]
-        payload = decode_jwt(token)
-        if payload["email"] != email:
-            return jsonify({"message": "Unauthorized", "status": "error"}), 401
-    except (AuthError, IndexError, AttributeError) as e:
+    if g.user_email != email:
         return jsonify({"message": "Unauthorized", "status": "error"}), 401
 
     try:
-        budget = budgets_collection.find_one({"email": email, "is_active": True})
-        
+        budget = budget_cache.get(email, min_version=g.get("data_version"))
+
         if not budget:
             return jsonify({"message": "No budget found", "budget": None}), 200
 
-        total_expenses = expenses_collection.aggregate([
-            {"$match": {"user_id": email}},
-            {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-        ])
-        total_expenses = next(total_expenses, {"total": 0})["total"]
+        # For a periodic budget, one point read of the current period's rollup
+        totals = periods.with_current(budget).totals()
+        body = {
+            "_id": budget.id,
+            "email": budget.email,
+            "amount": budget.amount,
+            "total_expenses": totals["total_expenses"],
+            "remaining": totals["remaining"],
+            "created_at": budget.created_at,
+            "updated_at": budget.updated_at,
+            "is_active": budget.is_active
+        }
+        if budget.period:
+            body.update({key: totals[key] for key in ("period", "reset_day", "period_start", "period_end")})
 
-        budget["_id"] = str(budget["_id"])
-        budget["created_at"] = budget["created_at"].isoformat() if "created_at" in budget else None
-        budget["updated_at"] = budget["updated_at"].isoformat()
-        
         return jsonify({
             "message": "Budget retrieved successfully",
-            "budget": {
-                "_id": budget["_id"],
-                "email": budget["email"],
-                "amount": budget["amount"],
-                "total_expenses": total_expenses,
-                "remaining": budget["amount"] - total_expenses,
-                "created_at": budget["created_at"],
-                "updated_at": budget["updated_at"],
-                "is_active": budget["is_active"]
-            }
+            "budget": body
         }), 200
 
     except Exception as e:
@@ -111,21 +122,22 @@ def get_budget(email):
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
 @budgets_bp.route("/budgets/<budget_id>", methods=["DELETE"])
+@require_auth
 def delete_budget(budget_id):
-    try:
-        token = request.headers.get("Authorization").split("Bearer ")[1]
-        payload = decode_jwt(token)
-        user_email = payload["email"]
-    except (AuthError, IndexError, AttributeError) as e:
-        return jsonify({"message": "Unauthorized", "status": "error"}), 401
+    user_email = g.user_email
 
     try:
-        result = budgets_collection.update_one(
+        deleted_budget = budgets_collection.find_one_and_update(
             {"_id": ObjectId(budget_id), "email": user_email},
-            {"$set": {"is_active": False, "updated_at": datetime.now(timezone.utc)}}
+            {"$set": {"is_active": False, "updated_at": datetime.now(timezone.utc)}, "$inc": {"version": 1}},
+            return_document=ReturnDocument.AFTER
         )
 
-        if result.modified_count > 0:
+        if deleted_budget:
+            budget_cache.invalidate(user_email)
+            analytics.invalidate(user_email)
+            events.publish(user_email, events.BUDGET_CHANGED,
+                           budget=events.budget_totals(periods.with_current(BudgetModel.from_doc(deleted_budget))))
             return jsonify({"message": "Budget deleted successfully"}), 200
         return jsonify({"error": "Budget not found or unauthorized"}), 404
 
@@ -1,121 +1,309 @@
-from flask import Blueprint, request, jsonify, current_app
-from backend.database import expenses_collection, budgets_collection
-from backend.auth import decode_jwt, AuthError
+from flask import Blueprint, Response, request, jsonify, current_app, g
+from backend.database import budgets_collection, tombstones_collection
+from backend.auth import require_auth
+from backend import (ledger, ingest, export, analytics, events, purge, periods, repository, serialization, writer,
+                     budget_cache)
+from backend.conditional import conditional
+from backend.models import BudgetModel, ExpenseBatch, ExpenseModel, ValidationError
 from bson.objectid import ObjectId
-from pymongo.errors import OperationFailure
+from pymongo.errors import OperationFailure, BulkWriteError, PyMongoError
+from bson.errors import InvalidId
 from datetime import datetime, timezone
+import base64
+import json
+import time
 
 expenses_bp = Blueprint("expenses", __name__)
 
-BEARER_PREFIX = "Bearer "
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+EXPENSE_FIELDS = ExpenseModel.FIELDS
 
-@expenses_bp.route("/expenses", methods=["POST"])
-def add_expense():
-    try:
-        token = request.headers.get("Authorization").split(BEARER_PREFIX)[1]
-        payload = decode_jwt(token)
-        user_email = payload["email"]
-    except (AuthError, IndexError, AttributeError) as e:
-        return jsonify({"message": "Unauthorized", "status": "error"}), 401
+# Bulk uploads are validated, budget-checked and inserted this many rows at a time
+BULK_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
 
-    data = request.get_json()
-    required_fields = ["amount"]
-    if not data or any(field not in data for field in required_fields):
-        return jsonify({"error": f"Missing required field: {', '.join(required_fields)}"}), 400
+# Documents per getMore while exporting; large enough to keep round trips rare
+EXPORT_BATCH_SIZE = 2000
 
-    try:
-        amount = float(data["amount"])
-        if amount <= 0:
-            return jsonify({"error": "Amount must be greater than zero"}), 400
-    except ValueError:
-        return jsonify({"error": "Invalid amount format"}), 400
+def encode_cursor(expense):
+    """Opaque keyset cursor pointing just past ``expense`` (an ``ExpenseModel``)."""
+    raw = json.dumps([expense.created_at.isoformat(), str(expense.id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
 
-    description = data.get("description", "")
+def decode_cursor(cursor):
+    created_at, expense_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return datetime.fromisoformat(created_at), ObjectId(expense_id)
 
-    # Check if budget exists and has sufficient funds
-    budget = budgets_collection.find_one({"email": user_email, "is_active": True})
-    if not budget:
-        return jsonify({"error": "No active budget found"}), 400
+@expenses_bp.route("/expenses", methods=["POST"])
+@require_auth
+def add_expense():
+    user_email = g.user_email
 
-    total_expenses = expenses_collection.aggregate([
-        {"$match": {"user_id": user_email}},
-        {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-    ])
-    total_expenses = next(total_expenses, {"total": 0})["total"]
+    try:
+        expense = ExpenseModel.from_input(request.get_json() or {}, user_email)
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
 
-    if (total_expenses + amount) > budget["amount"]:
+    # Reserve the amount against the budget (or its period) before the expense exists
+    expense.created_at = datetime.now(timezone.utc)
+    budget = ledger.reserve(user_email, expense.amount, when=expense.created_at)
+    if not budget:
+        if not budget_cache.get(user_email):
+            return jsonify({"error": "No active budget found"}), 400
         return jsonify({"error": "Expense exceeds remaining budget"}), 400
 
     try:
-        expense_data = {
-            "user_id": user_email,
-            "amount": amount,
-            "description": description,
-            "created_at": datetime.now(timezone.utc)
-        }
-        inserted_expense = expenses_collection.insert_one(expense_data)
-        
+        repo, generation = repository.for_user(user_email)
+        expense.generation = purge.stored(generation)
+        expense.id = writer.insert_expense(expense.to_doc(), repo=repo)
+        ledger.touch(user_email)
+        analytics.invalidate(user_email)
+        events.publish(user_email, events.EXPENSE_ADDED, expense=expense.to_doc(EXPENSE_FIELDS))
+        events.publish(user_email, events.BUDGET_CHANGED, budget=events.budget_totals(budget))
+
         return jsonify({
             "message": "Expense added successfully",
-            "expense_id": str(inserted_expense.inserted_id),
-            "amount": amount,
-            "description": description
+            "expense_id": expense.id,
+            "amount": expense.amount,
+            "category": expense.category,
+            "description": expense.description
         }), 201
 
     except OperationFailure as e:
+        ledger.release(user_email, expense.amount, when=expense.created_at)
         return jsonify({"error": f"Database error: {str(e)}"}), 500
     except Exception as e:
+        ledger.release(user_email, expense.amount, when=expense.created_at)
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
+@expenses_bp.route("/expenses/bulk", methods=["POST"])
+@require_auth
+def bulk_add_expenses():
+    """Import a JSON array, NDJSON or CSV upload of expenses.
+
+    Each chunk of ``BULK_CHUNK_SIZE`` valid rows is checked against the budget
+    once, as a whole, and written with a single unordered ``insert_many``.
+    """
+    user_email = g.user_email
+    parse = ingest.parser_for(request.mimetype)
+    if parse is None:
+        return jsonify({"error": "Unsupported content type, send application/json, "
+                                 "application/x-ndjson or text/csv"}), 415
+
+    started = time.perf_counter()
+    report = {"received": 0, "inserted": 0, "failed": 0, "errors": []}
+    batch, rows = ExpenseBatch(user_email), []
+    repo, generation = repository.for_user(user_email)
+    generation = purge.stored(generation)
+
+    try:
+        for row_number, row in enumerate(parse(request.stream), start=1):
+            report["received"] += 1
+            try:
+                batch.append_model(ExpenseModel.from_input(row, user_email))
+            except ValidationError as e:
+                _report_errors(report, [(row_number, str(e))])
+                continue
+            rows.append(row_number)
+            if len(batch) >= BULK_CHUNK_SIZE:
+                _insert_chunk(user_email, batch, rows, report, repo, generation)
+                batch, rows = ExpenseBatch(user_email), []
+    except ingest.IngestError as e:
+        report["error"] = str(e)
+    if len(batch):
+        _insert_chunk(user_email, batch, rows, report, repo, generation)
+    if report["inserted"]:
+        ledger.touch(user_email)
+        analytics.invalidate(user_email)
+        events.publish(user_email, events.EXPENSES_IMPORTED, count=report["inserted"])
+        budget = budgets_collection.find_one({"email": user_email})
+        events.publish(user_email, events.BUDGET_CHANGED,
+                       budget=events.budget_totals(periods.with_current(BudgetModel.from_doc(budget) if budget else None)))
+
+    elapsed = time.perf_counter() - started
+    report["errors_truncated"] = report["failed"] > len(report["errors"])
+    report["elapsed_seconds"] = round(elapsed, 3)
+    report["rows_per_second"] = round(report["received"] / elapsed, 1) if elapsed else None
+    report["message"] = "Bulk import finished"
+    return jsonify(report), 400 if "error" in report else 200
+
+def _report_errors(report, errors):
+    report["failed"] += len(errors)
+    room = MAX_REPORTED_ERRORS - len(report["errors"])
+    report["errors"].extend({"row": row, "error": error} for row, error in errors[:room])
+
+def _insert_chunk(user_email, batch, rows, report, repo, generation=None):
+    """Reserve and insert one ``ExpenseBatch`` through ``repo``; ``rows`` are its upload row numbers."""
+    total = batch.total()
+
+    created_at = datetime.now(timezone.utc)
+    if not ledger.reserve(user_email, total, len(batch), when=created_at):
+        if not budget_cache.get(user_email):
+            reason = "No active budget found"
+        else:
+            reason = "Batch exceeds remaining budget"
+        _report_errors(report, [(row_number, reason) for row_number in rows])
+        return
+
+    expenses = batch.to_docs(created_at=created_at, generation=generation)
+    try:
+        report["inserted"] += len(repo.insert_many(expenses))
+    except BulkWriteError as e:
+        failed = {error["index"]: error["errmsg"] for error in e.details["writeErrors"]}
+        ledger.release(user_email, batch.total(failed), len(failed), when=created_at)
+        report["inserted"] += e.details["nInserted"]
+        _report_errors(report, [(rows[i], f"Database error: {msg}") for i, msg in sorted(failed.items())])
+    except PyMongoError as e:
+        ledger.release(user_email, total, len(batch), when=created_at)
+        _report_errors(report, [(row_number, f"Database error: {str(e)}") for row_number in rows])
+
 @expenses_bp.route("/expenses/<email>", methods=["GET"])
+@require_auth
+@conditional
 def get_expenses(email):
-    try:
-        token = request.headers.get("Authorization").split(BEARER_PREFIX)[1]
-        payload = decode_jwt(token)
-        if payload["email"] != email:
-            return jsonify({"message": "Unauthorized", "status": "error"}), 401
-    except (AuthError, IndexError, AttributeError) as e:
+    if g.user_email != email:
         return jsonify({"message": "Unauthorized", "status": "error"}), 401
 
     try:
-        expenses = expenses_collection.find({"user_id": email}).sort("created_at", -1)
-        expense_list = []
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+        if not 0 < limit <= MAX_PAGE_SIZE:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    fields = EXPENSE_FIELDS
+    if request.args.get("fields"):
+        fields = tuple(f.strip() for f in request.args["fields"].split(",") if f.strip())
+        unknown = [f for f in fields if f not in EXPENSE_FIELDS]
+        if unknown:
+            return jsonify({"error": f"Unknown field(s): {', '.join(unknown)}"}), 400
+
+    after = None
+    if request.args.get("after"):
+        try:
+            after = decode_cursor(request.args["after"])
+        except (ValueError, TypeError, InvalidId):
+            return jsonify({"error": "Invalid cursor"}), 400
+
+    stream = request.args.get("stream", "").lower() in ("1", "true")
+
+    try:
+        count = ledger.expense_count(email)
+        repo, generation = repository.for_user(email)
+        # Newest first; one extra expense tells us whether there is a next page.
+        # The cursor keys are always fetched, even when the caller did not ask for them
+        expenses = repo.find(purge.live(email, generation), set(fields) | {"_id", "created_at"},
+                             after=after, descending=True, limit=limit + 1)
 
-        for expense in expenses:
-            expense["_id"] = str(expense["_id"])
-            expense["created_at"] = expense["created_at"].isoformat()
-            expense_list.append(expense)
+        if stream:
+            return Response(_stream_expenses(expenses, fields, limit, count), mimetype="application/json")
+
+        expense_list = [ExpenseModel.from_doc(doc) for doc in expenses]
+        next_cursor = None
+        if len(expense_list) > limit:
+            expense_list.pop()
+            next_cursor = encode_cursor(expense_list[-1])
+        if not {"_id", "created_at"}.issubset(fields):
+            expense_list = [expense.to_doc(fields) for expense in expense_list]
 
         return jsonify({
             "message": "Expenses retrieved successfully",
             "expenses": expense_list,
-            "count": len(expense_list)
+            "count": count,
+            "next_cursor": next_cursor
         }), 200
 
     except Exception as e:
         current_app.logger.error(f"Error retrieving expenses: {str(e)}")
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
+def _stream_expenses(expenses, fields, limit, count):
+    """Yield the listing as JSON text, one document at a time off the cursor."""
+    yield '{"message": "Expenses retrieved successfully", "count": %d, "expenses": [' % count
+    sent = 0
+    next_cursor = None
+    for doc in expenses:
+        if sent == limit:
+            next_cursor = encode_cursor(last)
+            break
+        expense = ExpenseModel.from_doc(doc)
+        yield ("," if sent else "") + serialization.dumps(expense.to_doc(fields))
+        last = expense
+        sent += 1
+    yield '], "next_cursor": %s}' % serialization.dumps(next_cursor)
+
+@expenses_bp.route("/expenses/<email>/export", methods=["GET"])
+@require_auth
+def export_expenses(email):
+    if g.user_email != email:
+        return jsonify({"message": "Unauthorized", "status": "error"}), 401
+
+    fmt = request.args.get("format", "csv").lower()
+    if fmt not in export.FORMATS:
+        return jsonify({"error": f"Unsupported format, use one of: {', '.join(export.FORMATS)}"}), 400
+    compress = request.args.get("gzip", "").lower() in ("1", "true")
+
+    repo, generation = repository.for_user(email)
+    expenses = repo.find(purge.live(email, generation), export.EXPORT_FIELDS, batch_size=EXPORT_BATCH_SIZE)
+
+    mimetype, extension = export.FORMATS[fmt]
+    filename = f"expenses.{extension}"
+    if compress:
+        mimetype = "application/gzip"
+        filename += ".gz"
+    return Response(
+        export.iter_export(expenses, fmt, compress),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @expenses_bp.route("/expenses/<expense_id>", methods=["DELETE"])
+@require_auth
 def delete_expense(expense_id):
-    try:
-        token = request.headers.get("Authorization").split(BEARER_PREFIX)[1]
-        payload = decode_jwt(token)
-        user_email = payload["email"]
-    except (AuthError, IndexError, AttributeError) as e:
-        return jsonify({"message": "Unauthorized", "status": "error"}), 401
+    user_email = g.user_email
 
     try:
-        result = expenses_collection.delete_one({
-            "_id": ObjectId(expense_id),
-            "user_id": user_email
-        })
+        # Out of every read now (see repository for when it is physically removed)
+        repo, generation = repository.for_user(user_email)
+        deleted = repo.soft_delete(user_email, ObjectId(expense_id), generation)
 
-        if result.deleted_count > 0:
+        if deleted:
+            expense = ExpenseModel.from_doc(deleted)
+            budget = ledger.release(user_email, expense.amount, when=expense.created_at)
+            # Lets reconnecting WebSocket clients drop the expense without a full resync
+            tombstones_collection.insert_one({
+                "user_id": user_email,
+                "expense_id": expense.id,
+                "deleted_at": datetime.now(timezone.utc)
+            })
+            analytics.invalidate(user_email)
+            events.publish(user_email, events.EXPENSE_DELETED, expense_id=expense_id)
+            events.publish(user_email, events.BUDGET_CHANGED, budget=events.budget_totals(budget))
             return jsonify({"message": "Expense deleted successfully"}), 200
         return jsonify({"error": "Expense not found or unauthorized"}), 404
 
     except OperationFailure as e:
         return jsonify({"error": f"Database error: {str(e)}"}), 500
     except Exception as e:
-        return jsonify({"error": f"Server error: {str(e)}"}), 500
\ No newline at end of file
+        return jsonify({"error": f"Server error: {str(e)}"}), 500
+
+@expenses_bp.route("/reset", methods=["POST"])
+@require_auth
+def reset_data():
+    """Delete every expense and zero the budget. Reads see it at once; the
+    old expenses are purged in the background (see ``backend.purge``)."""
+    user_email = g.user_email
+
+    try:
+        if purge.reset(user_email) is None:
+            return jsonify({"error": "User not found"}), 404
+        analytics.invalidate(user_email)
+        # Open dashboards resync and find the tombstone that tells them to start over
+        events.publish(user_email, events.RESYNC)
+        return jsonify({"message": "Data reset"}), 200
+
+    except OperationFailure as e:
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    except Exception as e:
+        return jsonify({"error": f"Server error: {str(e)}"}), 500
@@ -0,0 +1,33 @@
+from flask import Blueprint, abort
+import os
+
+from backend.assets import AssetStore, send_asset
+
+# Frontend static files, held in memory (see backend/assets.py)
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+TEMPLATE_DIR = os.path.join(BASE_DIR, "../../frontend")
+
+static_bp = Blueprint("static_files", __name__)
+store = AssetStore(TEMPLATE_DIR)
+
+
+def serve(name):
+    asset, fingerprinted = store.get(name)
+    if asset is None:
+        abort(404)
+    return send_asset(asset, fingerprinted)
+
+# Route: Homepage → serves index.html
+@static_bp.route("/")
+def home():
+    return serve("index.html")
+
+# Route: Dashboard → serves dashboard.html
+@static_bp.route("/dashboard")
+def dashboard():
+    return serve("dashboard.html")
+
+# Fallback: any other file in frontend/, by name or fingerprinted name
+@static_bp.route("/<path:filename>")
+def serve_static(filename):
+    return serve(filename)
@@ -1,27 +1,108 @@
-from flask import Blueprint, request, jsonify, session, current_app  # Add current_app for logging
-from database import users_collection
+from flask import Blueprint, Response, request, jsonify, session, current_app  # Add current_app for logging
+from backend.database import users_collection
+from backend.models import UserModel
+from backend import serialization
 from bson.objectid import ObjectId
+from bson.errors import InvalidId
+import base64
+import json
+import re
 
 users_bp = Blueprint("users", __name__)
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# The only fields that ever leave the server; password hashes are never read
+USER_PROJECTION = {"_id": 1, "username": 1, "email": 1}
+# Page order for each listing: plain by _id, prefix searches by the searched
+# field (email is unique, usernames need _id to break ties)
+USER_ORDERS = {
+    None: [("_id", 1)],
+    "email": [("email", 1)],
+    "username": [("username", 1), ("_id", 1)],
+}
+
+def encode_cursor(user, field):
+    """Opaque keyset cursor pointing just past ``user`` in ``field`` order."""
+    raw = json.dumps([getattr(user, field) if field else None, str(user.id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    key, user_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return key, ObjectId(user_id)
+
+def page_query(field, prefix, after):
+    """Filter for one page: anchored prefix on ``field`` plus the keyset bound."""
+    query = {}
+    if prefix:
+        # Anchored and case-sensitive, so it becomes an index range scan
+        query[field] = {"$regex": "^" + re.escape(prefix)}
+    if after:
+        key, user_id = after
+        if field is None:
+            query["_id"] = {"$gt": user_id}
+        elif field == "email":
+            query.setdefault("email", {})["$gt"] = key
+        else:
+            query["$or"] = [{field: {"$gt": key}}, {field: key, "_id": {"$gt": user_id}}]
+    return query
+
 @users_bp.route("/users/<user_id>", methods=["GET"])
 def get_user(user_id):
     # Debugging: Log session data
     current_app.logger.debug(f"Session data: {session}")
 
-    user = users_collection.find_one({"_id": ObjectId(user_id)})
-    if not user:
+    try:
+        doc = users_collection.find_one({"_id": ObjectId(user_id)}, USER_PROJECTION)
+    except InvalidId:
+        return jsonify({"error": "Invalid user ID"}), 400
+    if not doc:
         return jsonify({"error": "User not found"}), 404
 
-    user["_id"] = str(user["_id"])  # Convert ObjectId to string
-    return jsonify(user)
+    return jsonify(UserModel.from_doc(doc))
 
 @users_bp.route("/users", methods=["GET"])
 def get_all_users():
     # Debugging: Log session data
     current_app.logger.debug(f"Session data: {session}")
 
-    users = list(users_collection.find({}))
-    for user in users:
-        user["_id"] = str(user["_id"])
-    return jsonify(users)
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+        if not 0 < limit <= MAX_PAGE_SIZE:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    prefix = request.args.get("q", "").strip()
+    field = None
+    if prefix:
+        field = request.args.get("field", "email")
+        if field not in ("email", "username"):
+            return jsonify({"error": "field must be email or username"}), 400
+
+    after = None
+    if request.args.get("after"):
+        try:
+            after = decode_cursor(request.args["after"])
+        except (ValueError, TypeError, InvalidId):
+            return jsonify({"error": "Invalid cursor"}), 400
+
+    # One extra document tells us whether there is a next page
+    users = users_collection.find(page_query(field, prefix, after), USER_PROJECTION) \
+        .sort(USER_ORDERS[field]).limit(limit + 1)
+    return Response(_stream_users(users, field, limit), mimetype="application/json")
+
+def _stream_users(users, field, limit):
+    """Yield the page as JSON text, one user at a time off the cursor."""
+    yield '{"users": ['
+    sent = 0
+    next_cursor = None
+    for doc in users:
+        if sent == limit:
+            next_cursor = encode_cursor(last, field)
+            break
+        user = UserModel.from_doc(doc)
+        yield ("," if sent else "") + serialization.dumps(user)
+        last = user
+        sent += 1
+    yield '], "next_cursor": %s}' % serialization.dumps(next_cursor)
@@ -0,0 +1,72 @@
+# backend/serialization.py
+"""One JSON encoder for REST responses and WebSocket frames.
+
+MongoDB documents go in as they come off the cursor: ``ObjectId`` becomes
+its hex string, ``datetime`` ISO 8601 and ``Decimal128`` a number, so routes
+no longer walk every document converting fields by hand. Models from
+``backend.models`` are encoded through their ``to_doc``. orjson does the
+encoding when it is installed; otherwise the standard library does, with
+the same output.
+"""
+import json
+from datetime import date, datetime
+
+from bson.decimal128 import Decimal128
+from bson.objectid import ObjectId
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional: pip install orjson
+    orjson = None
+
+
+def default(value):
+    """Encode the BSON types JSON has no native form for."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return float(value.to_decimal())
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    to_doc = getattr(value, "to_doc", None)
+    if to_doc is not None:
+        return to_doc()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj):
+        return orjson.dumps(obj, default=default, option=_ORJSON_OPTIONS)
+
+    def dumps(obj):
+        return orjson.dumps(obj, default=default, option=_ORJSON_OPTIONS).decode()
+
+    loads = orjson.loads
+else:
+    def dumps(obj):
+        return json.dumps(obj, default=default, separators=(",", ":"))
+
+    def dumps_bytes(obj):
+        return dumps(obj).encode()
+
+    loads = json.loads
+
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider backed by ``dumps``/``loads`` above.
+
+    Keys keep insertion order and the output is always compact.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype="application/json")
@@ -0,0 +1,164 @@
+# backend/sessions.py
+"""Server-side sessions with a pluggable store.
+
+The cookie only carries a signed session id; the data lives in the store.
+``memory`` keeps sessions in a bounded LRU inside the process (fine for a
+single worker), ``mongo`` keeps them in a collection with a TTL index so
+every worker sees the same sessions and expired ones are removed by MongoDB.
+
+Storage is only touched when it has to be: a session is written back only
+when a request modified it, and requests under SESSION_SKIP_PREFIXES (the
+JWT-only API and the WebSocket) never load one at all.
+"""
+import secrets
+import time
+from datetime import datetime, timezone
+
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+from backend.cache import LRUCache
+from backend.config import Config
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session dict that remembers whether it was changed."""
+
+    def __init__(self, sid, data=None, new=False):
+        def on_update(session):
+            session.modified = True
+        super().__init__(data or {}, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class SessionStore:
+    """Interface every session store implements."""
+
+    def load(self, sid):
+        """The stored data for ``sid``, or ``None`` if it is missing or expired."""
+        raise NotImplementedError
+
+    def save(self, sid, data, ttl):
+        raise NotImplementedError
+
+    def delete(self, sid):
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """Sessions in a bounded in-process LRU; the least recently used go first."""
+
+    def __init__(self, maxsize):
+        self._cache = LRUCache(maxsize)
+
+    def load(self, sid):
+        data = self._cache.get(sid)
+        return None if data is None else dict(data)
+
+    def save(self, sid, data, ttl):
+        self._cache.set(sid, dict(data), expires_at=time.time() + ttl)
+
+    def delete(self, sid):
+        self._cache.pop(sid)
+
+    def stats(self):
+        return self._cache.stats()
+
+
+class MongoSessionStore(SessionStore):
+    """Sessions in a MongoDB collection, expired by the ``expires_at`` TTL index.
+
+    The TTL monitor only runs once a minute, so reads check the expiry too.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def load(self, sid):
+        document = self.collection.find_one(
+            {"_id": sid, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+            {"data": 1}
+        )
+        return None if document is None else document["data"]
+
+    def save(self, sid, data, ttl):
+        self.collection.replace_one(
+            {"_id": sid},
+            {"data": dict(data), "expires_at": datetime.fromtimestamp(time.time() + ttl, timezone.utc)},
+            upsert=True
+        )
+
+    def delete(self, sid):
+        self.collection.delete_one({"_id": sid})
+
+
+def create_store(kind=None):
+    kind = kind or Config.SESSION_STORE
+    if kind == "mongo":
+        from backend.database import LazyCollection
+        return MongoSessionStore(LazyCollection("sessions"))
+    if kind == "memory":
+        return MemorySessionStore(Config.SESSION_CACHE_SIZE)
+    raise ValueError(f"Unknown session store: {kind}")
+
+
+class StoreSessionInterface(SessionInterface):
+    """Flask session interface backed by a ``SessionStore``."""
+
+    def __init__(self, store, ttl, skip_prefixes=()):
+        self.store = store
+        self.ttl = ttl
+        self.skip_prefixes = tuple(skip_prefixes)
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt="session")
+
+    def open_session(self, app, request):
+        if request.path.startswith(self.skip_prefixes):
+            return self.make_null_session(app)
+
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode()
+            except BadSignature:
+                sid = None
+            if sid:
+                data = self.store.load(sid)
+                if data is not None:
+                    return ServerSession(sid, data)
+        return ServerSession(secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        if self.is_null_session(session) or not session.modified:
+            return
+
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if not session:
+            if not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly)
+            return
+
+        self.store.save(session.sid, session, self.ttl)
+        response.set_cookie(
+            name,
+            self._signer(app).sign(session.sid).decode(),
+            expires=self.get_expiration_time(app, session),
+            domain=domain,
+            path=path,
+            secure=secure,
+            samesite=samesite,
+            httponly=httponly,
+        )
+        response.vary.add("Cookie")
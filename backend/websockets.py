@@ -1,39 +1,181 @@
-from flask import Flask
+from flask import request
 from flask_sock import Sock  # Import Flask-Sock
-import json
-from database import expenses_collection  # MongoDB connection
-from datetime import datetime
+from simple_websocket import ConnectionClosed
+import logging
+import threading
+import time
+import zlib
+from bson.errors import InvalidId
+from backend.config import Config
+from backend.database import tombstones_collection  # MongoDB connection
+from backend.auth import verify_token, AuthError
+from backend.routes.expenses import EXPENSE_FIELDS, encode_cursor, decode_cursor
+from backend.models import ExpenseModel
+from backend import events, metrics, purge, repository, serialization
+from datetime import datetime, timezone, timedelta
 
-app = Flask(__name__)
 sock = Sock()
+logger = logging.getLogger(__name__)
 
-def serialize_expense(expense):
-    """Convert MongoDB expense document to JSON serializable format."""
-    expense["date"] = expense["date"].isoformat() if isinstance(expense["date"], datetime) else expense["date"]
-    return expense
+# How long receive() blocks before the subscription is checked for pushed events
+POLL_INTERVAL = 0.25
+# Past this many deletions since the client's last sync, a full reset is cheaper
+MAX_TOMBSTONES = 1000
+# Close code 1013: "Try Again Later"
+TRY_AGAIN_LATER = 1013
+
+_connection_slots = threading.BoundedSemaphore(Config.WS_MAX_CONNECTIONS)
+_active_connections = 0
+_active_lock = threading.Lock()
+
+def connection_count():
+    return _active_connections
+
+metrics.Gauge("websocket_connections", "Open /ws connections in this process", connection_count)
+
+def send_frame(ws, payload, compress):
+    """Send ``payload`` as JSON, deflated into a binary frame when it is large.
+
+    simple-websocket does not negotiate permessage-deflate, so clients that
+    announce ``compress`` get zlib-compressed binary frames instead.
+    """
+    data = serialization.dumps_bytes(payload)
+    if compress and len(data) >= Config.WS_COMPRESS_THRESHOLD:
+        ws.send(zlib.compress(data))
+    else:
+        ws.send(data.decode())
+
+def sync_expenses(ws, user_email, message, compress):
+    """Send everything newer than the client's watermark, plus deletions.
+
+    The client passes the ``watermark`` and ``synced_at`` from its previous
+    sync as ``since`` and ``deleted_since``; with neither it gets the whole
+    history. Expenses go out oldest first in batches of WS_SYNC_BATCH_SIZE.
+
+    ``created_at`` is stamped before the insert, so an expense can land after
+    a sync with a stamp older than what that sync sent. The watermark never
+    passes expenses younger than WS_SYNC_SETTLE_SECONDS; those are sent again
+    next time, and clients replace expenses by ``_id``.
+    """
+    synced_at = datetime.now(timezone.utc)
+    since = message.get("since")
+    deleted_since = message.get("deleted_since")
+
+    try:
+        if deleted_since:
+            deleted_since = datetime.fromisoformat(deleted_since)
+            if deleted_since.tzinfo is None:
+                deleted_since = deleted_since.replace(tzinfo=timezone.utc)
+        after = decode_cursor(since) if since else None
+    except (ValueError, TypeError, InvalidId):
+        send_frame(ws, {"event": "error", "message": "Invalid sync watermark"}, compress)
+        return
+
+    tombstones = []
+    # A client whose watermark has not moved yet still needs the deletions
+    if deleted_since:
+        retention = timedelta(seconds=Config.TOMBSTONE_RETENTION_SECONDS)
+        tombstones = [
+            t["expense_id"] for t in tombstones_collection.find(
+                {"user_id": user_email, "deleted_at": {"$gt": deleted_since}},
+                {"expense_id": 1}
+            ).limit(MAX_TOMBSTONES + 1)
+        ]
+        # Deletions older than the retention window are gone; so is a huge backlog.
+        # A None expense_id marks a reset of the user's whole history.
+        if deleted_since < synced_at - retention or len(tombstones) > MAX_TOMBSTONES or None in tombstones:
+            send_frame(ws, {"event": "sync_reset"}, compress)
+            return sync_expenses(ws, user_email, {}, compress)
+    elif since:
+        send_frame(ws, {"event": "sync_reset"}, compress)
+        return sync_expenses(ws, user_email, {}, compress)
+
+    batch_size = Config.WS_SYNC_BATCH_SIZE
+    repo, generation = repository.for_user(user_email)
+    # Oldest first, so the watermark only moves forward
+    expenses = repo.find(purge.live(user_email, generation), EXPENSE_FIELDS, after=after, batch_size=batch_size)
+    settled = synced_at - timedelta(seconds=Config.WS_SYNC_SETTLE_SECONDS)
+    watermark = since
+    batch = []
+    for doc in expenses:
+        expense = ExpenseModel.from_doc(doc)
+        batch.append(expense)
+        # Datetimes read back from MongoDB are naive UTC
+        if expense.created_at.replace(tzinfo=timezone.utc) < settled:
+            watermark = encode_cursor(expense)
+        if len(batch) == batch_size:
+            send_frame(ws, {"event": "sync_batch", "expenses": batch, "watermark": watermark, "done": False}, compress)
+            batch = []
+
+    send_frame(ws, {
+        "event": "sync_batch",
+        "expenses": batch,
+        "tombstones": tombstones,
+        "watermark": watermark,
+        "synced_at": synced_at,
+        "done": True
+    }, compress)
 
 
 @sock.route("/ws")  # WebSocket route
 def websocket_handler(ws):
-    print("Client connected to WebSocket")
-
-    while True:
-        data = ws.receive()
-        if not data:
-            break  # Stop when client disconnects
-
-        message = json.loads(data)
-        print(f"📩 Received message: {message}")
-        if message.get("event") == "fetch_expenses":
-            user_id = message.get("user_id")
-            expenses = list(expenses_collection.find({"user_id": user_id}, {"_id": 0}))
-            expenses_serialized = [serialize_expense(exp) for exp in expenses]
-            response = {"event": "expense_update", "expenses": expenses_serialized}
-            ws.send(json.dumps(response))
-            print(f"📤 Sent expense update: {response}")  # Debugging output
-        
-        elif message.get("event") == "new_expense":
-            print(f"New expense added: {message}")
-            ws.send(json.dumps({"event": "expense_update", "message": "New expense added", "data": message}))
-
-    print("Client disconnected")
+    global _active_connections
+    if not _connection_slots.acquire(blocking=False):
+        ws.close(reason=TRY_AGAIN_LATER, message="Too many connections")
+        return
+    with _active_lock:
+        _active_connections += 1
+    try:
+        serve_connection(ws)
+    finally:
+        with _active_lock:
+            _active_connections -= 1
+        _connection_slots.release()
+
+def serve_connection(ws):
+    # Browsers cannot set headers on a WebSocket, so the JWT comes in the query string
+    try:
+        claims = verify_token(request.args.get("token", ""))
+    except AuthError:
+        send_frame(ws, {"event": "error", "message": "Unauthorized"}, False)
+        return
+    user_email = claims["email"]
+    compress = False
+
+    subscription = events.get_broker().subscribe(user_email)
+    logger.info("Client connected to WebSocket: %s", user_email)
+    last_message = time.monotonic()
+
+    try:
+        while True:
+            for event in subscription.drain():
+                send_frame(ws, event, compress)
+
+            data = ws.receive(timeout=POLL_INTERVAL)
+            if data is None:
+                if time.monotonic() - last_message > Config.WS_IDLE_TIMEOUT:
+                    ws.close(message="Idle timeout")
+                    break
+                continue
+            last_message = time.monotonic()
+
+            try:
+                message = serialization.loads(data)
+            except ValueError:
+                continue
+            if not isinstance(message, dict):
+                continue
+            compress = bool(message.get("compress", compress))
+            if message.get("event") == "sync":
+                sync_expenses(ws, user_email, message, compress)
+            elif message.get("event") == "fetch_expenses":
+                # Legacy full fetch, now sent in bounded batches
+                sync_expenses(ws, user_email, {}, compress)
+            elif message.get("event") == "ping":
+                send_frame(ws, {"event": "pong"}, compress)
+    except ConnectionClosed:
+        pass
+    finally:
+        subscription.close()
+
+    logger.info("Client disconnected: %s", user_email)
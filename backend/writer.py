@@ -0,0 +1,119 @@
+# backend/writer.py
+"""Expense inserts, written directly or group-committed.
+
+With ``EXPENSE_WRITE_MODE=group``, inserts from every request thread are
+queued to one flusher thread. It writes them with a single unordered
+``insert_many`` once ``GROUP_COMMIT_MAX_DOCS`` are waiting, or
+``GROUP_COMMIT_MAX_DELAY_MS`` after the oldest one arrived, whichever
+comes first. Each caller still blocks until its own document is
+acknowledged. A document the server rejects raises its own ``WriteError``
+in its own caller and leaves the rest of the batch alone. The default,
+``direct``, keeps one ``insert_one`` per expense. Either way the write goes
+through a repository (see ``backend.repository``), so it lands in the
+user's storage layout; each layout gets its own flusher.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError, WriteError
+
+from backend import metrics, repository
+from backend.config import Config
+
+batch_sizes = metrics.Histogram(
+    "group_commit_batch_size", "Expenses written per group-commit insert_many",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+
+
+class GroupCommitWriter:
+    """Coalesces ``insert`` calls from many threads into batched inserts."""
+
+    def __init__(self, repository, max_docs, max_delay_ms):
+        self.repository = repository
+        self.max_docs = max_docs
+        self.max_delay = max_delay_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+        self._thread.start()
+
+    def insert(self, doc):
+        """Queue ``doc`` and wait until it is written. Returns its ``_id``."""
+        # Assigned here so the caller's id does not depend on its place in the batch
+        doc.setdefault("_id", ObjectId())
+        future = Future()
+        self._queue.put((doc, future))
+        future.result()
+        return doc["_id"]
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_docs:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            batch_sizes.observe(len(batch))
+            self._flush(batch)
+
+    def _flush(self, batch):
+        try:
+            self.repository.insert_many([doc for doc, _ in batch])
+        except BulkWriteError as e:
+            failed = {error["index"]: error for error in e.details["writeErrors"]}
+            for index, (_, future) in enumerate(batch):
+                error = failed.get(index)
+                if error is None:
+                    future.set_result(None)
+                else:
+                    future.set_exception(WriteError(error["errmsg"], error["code"], error))
+            return
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for _, future in batch:
+            future.set_result(None)
+
+
+_writers = {}
+_writers_pid = None
+_writer_lock = threading.Lock()
+
+
+def get_writer(repo=None):
+    """This process's writer for ``repo``, started on first use (and again after fork)."""
+    global _writers, _writers_pid
+    repo = repo or repository.get()
+    pid = os.getpid()
+    writer = _writers.get(repo.name) if _writers_pid == pid else None
+    if writer is None:
+        with _writer_lock:
+            if _writers_pid != pid:
+                _writers, _writers_pid = {}, pid
+            writer = _writers.get(repo.name)
+            if writer is None:
+                writer = _writers[repo.name] = GroupCommitWriter(repo, Config.GROUP_COMMIT_MAX_DOCS,
+                                                                 Config.GROUP_COMMIT_MAX_DELAY_MS)
+    return writer
+
+
+def insert_expense(doc, mode=None, repo=None):
+    """Insert one expense document in the configured mode; returns its ``_id``."""
+    repo = repo or repository.get()
+    if (mode or Config.EXPENSE_WRITE_MODE) == "group":
+        return get_writer(repo).insert(doc)
+    return repo.insert(doc)
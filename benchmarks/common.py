@@ -0,0 +1,94 @@
+"""Helpers shared by the benchmark scripts.
+
+Import this before anything from ``backend``: it points the app at a
+dedicated benchmark database unless MONGO_URI/MONGO_DB are already set.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_DB", "expense_tracker_bench")
+os.environ.setdefault("ENSURE_INDEXES_ON_STARTUP", "false")
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def use_mongomock():
+    """Run against an in-process mongomock client instead of a mongod.
+
+    Numbers measured this way are only good for comparing Python-side
+    costs; mongomock's query engine is far slower than a real server.
+    """
+    import mongomock
+    from backend import database
+
+    database._client = mongomock.MongoClient()
+    database._client_pid = os.getpid()
+
+
+def percentile(samples, p):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+def latency_summary(samples_ms):
+    """Count and p50/p95/p99/mean/max of a list of latencies in milliseconds."""
+    if not samples_ms:
+        return {"count": 0}
+    return {
+        "count": len(samples_ms),
+        "p50_ms": round(percentile(samples_ms, 50), 3),
+        "p95_ms": round(percentile(samples_ms, 95), 3),
+        "p99_ms": round(percentile(samples_ms, 99), 3),
+        "mean_ms": round(sum(samples_ms) / len(samples_ms), 3),
+        "max_ms": round(max(samples_ms), 3),
+    }
+
+
+def timed(fn, *args, **kwargs):
+    """``(result, elapsed milliseconds)`` of one call."""
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, 1000 * (time.perf_counter() - started)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """What a result was measured on, so runs can be compared fairly."""
+    modules = {}
+    for name in ("orjson", "numpy", "mongomock"):
+        module = sys.modules.get(name)
+        modules[name] = getattr(module, "__version__", None) if module else None
+    return {
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "mongo": "mongomock" if modules["mongomock"] else os.environ.get("MONGO_URI"),
+        "modules": modules,
+    }
+
+
+def write_result(name, result, output=None):
+    """Print ``result`` as JSON, or write it to ``output``, tagged with the environment."""
+    text = json.dumps({"benchmark": name, "environment": environment(), **result}, indent=2, default=str)
+    if output:
+        with open(output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
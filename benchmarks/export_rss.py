@@ -0,0 +1,124 @@
+"""Show that expense exports run in constant memory.
+
+Streams N expenses through backend.export and samples the process RSS as
+it goes. By default the rows come from an in-process generator so only the
+encoder is measured; pass --uri to seed a real mongod and read them back
+through a cursor with the same batch size the route uses.
+
+    python -m benchmarks.export_rss --rows 1000000 --format csv --gzip
+    python -m benchmarks.export_rss --uri mongodb://localhost:27017
+"""
+import argparse
+import json
+import os
+import resource
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson.objectid import ObjectId
+
+from backend.export import iter_export
+
+EXPORT_BATCH_SIZE = 2000
+SEED_BATCH_SIZE = 10000
+SAMPLE_EVERY = 50000
+
+
+def rss_bytes():
+    """Current resident set size (Linux), falling back to the peak RSS."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def synthetic_expenses(rows, user_id="bench@example.com"):
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    for i in range(rows):
+        yield {
+            "_id": ObjectId(),
+            "user_id": user_id,
+            "amount": float(i % 500) + 0.99,
+            "description": f"Synthetic expense {i}",
+            "created_at": start + timedelta(seconds=i),
+        }
+
+
+def mongo_expenses(uri, rows):
+    from pymongo import MongoClient
+
+    collection = MongoClient(uri)["export_bench"]["expenses"]
+    if collection.estimated_document_count() != rows:
+        collection.drop()
+        batch = []
+        for expense in synthetic_expenses(rows):
+            batch.append(expense)
+            if len(batch) == SEED_BATCH_SIZE:
+                collection.insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            collection.insert_many(batch, ordered=False)
+        collection.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
+    return collection.find({"user_id": "bench@example.com"}).sort(
+        [("created_at", 1), ("_id", 1)]).batch_size(EXPORT_BATCH_SIZE)
+
+
+def run(expenses, fmt, compress):
+    samples = []
+    counted = 0
+
+    def counting(source):
+        nonlocal counted
+        for expense in source:
+            counted += 1
+            if counted % SAMPLE_EVERY == 0:
+                samples.append({"rows": counted, "rss_bytes": rss_bytes()})
+            yield expense
+
+    baseline = rss_bytes()
+    started = time.perf_counter()
+    output_bytes = sum(len(chunk) for chunk in iter_export(counting(expenses), fmt, compress))
+    elapsed = time.perf_counter() - started
+
+    peak = max((s["rss_bytes"] for s in samples), default=baseline)
+    return {
+        "rows": counted,
+        "format": fmt,
+        "gzip": compress,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(counted / elapsed, 1) if elapsed else None,
+        "output_bytes": output_bytes,
+        "baseline_rss_bytes": baseline,
+        "peak_rss_bytes": peak,
+        "rss_growth_bytes": peak - baseline,
+        "samples": samples,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=("csv", "ndjson"), default="csv")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--uri", help="read from this mongod instead of a generator")
+    parser.add_argument("--output", help="write the JSON result here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.uri:
+        expenses = mongo_expenses(args.uri, args.rows)
+    else:
+        expenses = synthetic_expenses(args.rows)
+    result = run(expenses, args.format, args.gzip)
+    result["source"] = "mongo" if args.uri else "synthetic"
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Expense insert throughput: direct insert_one vs. the group-commit writer.
+
+--threads threads insert expense documents through ``writer.insert_expense``
+for --seconds in each mode, the way POST /api/expenses does after its
+budget check. Reports inserts/sec and per-insert latency percentiles for
+each mode. The documents are deleted afterwards.
+
+    python -m benchmarks.group_commit --threads 32 --seconds 10
+    python -m benchmarks.group_commit --max-docs 200 --max-delay-ms 5 --output gc.json
+"""
+import argparse
+import threading
+import time
+from datetime import datetime, timezone
+
+from benchmarks import common  # first: points backend at the benchmark database
+
+from backend import writer
+from backend.config import Config
+from backend.database import expenses_collection
+
+USER_ID = "group-commit-bench@example.com"
+MODES = ("direct", "group")
+
+
+def run(mode, threads, seconds):
+    lock = threading.Lock()
+    latencies = []
+    errors = [0]
+    ready = threading.Barrier(threads + 1)
+    go = threading.Event()
+    window = {}
+
+    def worker(n):
+        samples = []
+        failed = 0
+        ready.wait()
+        go.wait()
+        i = 0
+        while time.perf_counter() < window["deadline"]:
+            doc = {"user_id": USER_ID, "amount": 1.0 + i % 50, "category": "bench",
+                   "description": f"{mode} {n}/{i}", "created_at": datetime.now(timezone.utc)}
+            started = time.perf_counter()
+            try:
+                writer.insert_expense(doc, mode)
+            except Exception:
+                failed += 1
+            samples.append(1000 * (time.perf_counter() - started))
+            i += 1
+        with lock:
+            latencies.extend(samples)
+            errors[0] += failed
+
+    workers = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    ready.wait()
+    started = time.perf_counter()
+    window["deadline"] = started + seconds
+    go.set()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    summary = common.latency_summary(latencies)
+    summary["errors"] = errors[0]
+    summary["inserts_per_second"] = round(len(latencies) / elapsed, 1)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5, help="time spent in each mode")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--max-docs", type=int, default=Config.GROUP_COMMIT_MAX_DOCS)
+    parser.add_argument("--max-delay-ms", type=float, default=Config.GROUP_COMMIT_MAX_DELAY_MS)
+    parser.add_argument("--mongomock", action="store_true", help="use an in-process mongomock")
+    parser.add_argument("--output", help="write the JSON result here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.mongomock:
+        common.use_mongomock()
+    Config.GROUP_COMMIT_MAX_DOCS = args.max_docs
+    Config.GROUP_COMMIT_MAX_DELAY_MS = args.max_delay_ms
+
+    results = {}
+    try:
+        for mode in args.modes:
+            results[mode] = run(mode, args.threads, args.seconds)
+    finally:
+        expenses_collection.delete_many({"user_id": USER_ID})
+    common.write_result("group_commit", {
+        "threads": args.threads,
+        "seconds_per_mode": args.seconds,
+        "max_docs": args.max_docs,
+        "max_delay_ms": args.max_delay_ms,
+        "results": results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
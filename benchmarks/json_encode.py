@@ -0,0 +1,105 @@
+"""Encode throughput for expense listings: old per-document path vs. the provider.
+
+"legacy" is what the routes used to do: walk every document converting
+ObjectId and datetime by hand, then json.dumps with Flask's default
+settings (sorted keys). "stdlib" and "orjson" hand the raw documents to
+backend.serialization in one pass; orjson is skipped when not installed.
+
+    python -m benchmarks.json_encode --sizes 10000 100000 --repeat 5
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson.objectid import ObjectId
+
+from backend import serialization
+
+EXPENSE_FIELDS = ("_id", "user_id", "amount", "category", "description", "created_at")
+
+
+def synthetic_expenses(count):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "_id": ObjectId(),
+            "user_id": "bench@example.com",
+            "amount": float(i % 500) + 0.99,
+            "category": ("food", "rent", "travel", "fun")[i % 4],
+            "description": f"Synthetic expense {i}",
+            "created_at": start + timedelta(seconds=i),
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_encode(expenses):
+    docs = []
+    for expense in expenses:
+        doc = {}
+        for field in EXPENSE_FIELDS:
+            value = expense[field]
+            if isinstance(value, ObjectId):
+                value = str(value)
+            elif isinstance(value, datetime):
+                value = value.isoformat()
+            doc[field] = value
+        docs.append(doc)
+    return json.dumps({"expenses": docs}, sort_keys=True, separators=(",", ":")).encode()
+
+
+def stdlib_encode(expenses):
+    return json.dumps({"expenses": expenses}, default=serialization.default, separators=(",", ":")).encode()
+
+
+def orjson_encode(expenses):
+    return serialization.dumps_bytes({"expenses": expenses})
+
+
+def measure(encode, expenses, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = encode(expenses)
+        timings.append(time.perf_counter() - started)
+    best = min(timings)
+    return {
+        "best_ms": round(1000 * best, 2),
+        "median_ms": round(1000 * statistics.median(timings), 2),
+        "docs_per_second": round(len(expenses) / best),
+        "mb_per_second": round(len(output) / best / 1e6, 1),
+        "output_bytes": len(output),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write the JSON result here instead of stdout")
+    args = parser.parse_args(argv)
+
+    encoders = {"legacy": legacy_encode, "stdlib": stdlib_encode}
+    if serialization.orjson is not None:
+        encoders["orjson"] = orjson_encode
+
+    result = {"repeat": args.repeat, "orjson": serialization.orjson is not None, "sizes": {}}
+    for size in args.sizes:
+        expenses = synthetic_expenses(size)
+        runs = {name: measure(encode, expenses, args.repeat) for name, encode in encoders.items()}
+        for run in runs.values():
+            run["speedup_vs_legacy"] = round(runs["legacy"]["best_ms"] / run["best_ms"], 2)
+        result["sizes"][str(size)] = runs
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""Concurrent load driver: signup, login, add-expense, list and ws-sync mixes.
+
+Every worker logs in as one of the seeded users and then runs operations
+picked at random with the --mix weights until --seconds run out. Latency
+percentiles and requests/sec are reported per operation and overall. The
+app runs in process behind Flask's test client by default; --url drives a
+running server over HTTP and WebSocket instead.
+
+    python -m benchmarks.seed --users 100 --expenses 1000
+    python -m benchmarks.load --workers 16 --seconds 30 --mix login=1,add=5,list=20,ws_sync=2
+    python -m benchmarks.load --url http://localhost:5000 --output run.json
+    python -m benchmarks.load --mongomock --workers 4 --seconds 5
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+from benchmarks import common  # first: points backend at the benchmark database
+
+from benchmarks.seed import BENCH_PASSWORD, bench_email, seed
+
+DEFAULT_MIX = "signup=1,login=2,add=5,list=10,ws_sync=1"
+LIST_PAGE_SIZE = 50
+
+
+class InProcessClient:
+    """Talks to an app object through its test client."""
+
+    def __init__(self, app):
+        self.app = app
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None, token=None):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        response = self.client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_json(silent=True)
+
+    def ws_sync(self, token, email):
+        from backend.auth import verify_token
+        from backend.websockets import sync_expenses
+
+        class Socket:
+            frames = 0
+
+            def send(self, data):
+                self.frames += 1
+
+        socket = Socket()
+        with self.app.test_request_context("/ws"):
+            verify_token(token)
+            sync_expenses(socket, email, {}, False)
+        return socket.frames
+
+
+class HttpClient:
+    """Talks to a running server; one keep-alive connection per worker."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.netloc
+        self.ws_url = ("wss://" if parts.scheme == "https" else "ws://") + parts.netloc
+        connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.connection = connection_class(self.host, timeout=30)
+
+    def request(self, method, path, body=None, token=None):
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        payload = json.dumps(body) if body is not None else None
+        try:
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            # Dropped keep-alive connection; retry once on a fresh one
+            self.connection.close()
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+        data = response.read()
+        try:
+            return response.status, json.loads(data)
+        except ValueError:
+            return response.status, None
+
+    def ws_sync(self, token, email):
+        import zlib
+        from simple_websocket import Client
+
+        ws = Client.connect(f"{self.ws_url}/ws?token={token}")
+        try:
+            ws.send(json.dumps({"event": "sync"}))
+            frames = 0
+            while True:
+                data = ws.receive(timeout=30)
+                if data is None:
+                    raise TimeoutError("No sync_batch within 30s")
+                frames += 1
+                message = json.loads(zlib.decompress(data) if isinstance(data, bytes) else data)
+                if message.get("event") == "sync_batch" and message.get("done"):
+                    return frames
+        finally:
+            ws.close()
+
+
+def op_signup(client, state):
+    email = f"load-{uuid.uuid4().hex}@example.com"
+    status, _ = client.request("POST", "/api/signup", {"username": email, "email": email, "password": BENCH_PASSWORD})
+    return status == 201
+
+
+def op_login(client, state):
+    status, body = client.request("POST", "/api/login", {"email": state["email"], "password": BENCH_PASSWORD})
+    return status == 200 and bool(body and body.get("token"))
+
+
+def op_add(client, state):
+    body = {"amount": round(state["rng"].uniform(1, 50), 2), "category": "load", "description": "Load test"}
+    status, _ = client.request("POST", "/api/expenses", body, token=state["token"])
+    return status == 201
+
+
+def op_list(client, state):
+    status, _ = client.request("GET", f"/api/expenses/{state['email']}?limit={LIST_PAGE_SIZE}", token=state["token"])
+    return status == 200
+
+
+def op_ws_sync(client, state):
+    return client.ws_sync(state["token"], state["email"]) > 0
+
+
+OPERATIONS = {
+    "signup": op_signup,
+    "login": op_login,
+    "add": op_add,
+    "list": op_list,
+    "ws_sync": op_ws_sync,
+}
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation {name!r}, use: {', '.join(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def run(make_client, workers, seconds, mix, users, seed_value):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    lock = threading.Lock()
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    failed_logins = []
+    ready = threading.Barrier(workers + 1)
+    go = threading.Event()
+    window = {}
+
+    def worker(n):
+        client = make_client()
+        state = {"email": bench_email(n % users), "rng": random.Random(seed_value + n)}
+        status, body = client.request("POST", "/api/login", {"email": state["email"], "password": BENCH_PASSWORD})
+        state["token"] = (body or {}).get("token")
+        ready.wait()
+        go.wait()
+        if not state["token"]:
+            with lock:
+                failed_logins.append(f"{state['email']}: {status}")
+            return
+        while time.perf_counter() < window["deadline"]:
+            name = state["rng"].choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                ok = OPERATIONS[name](client, state)
+            except Exception:
+                ok = False
+            elapsed = 1000 * (time.perf_counter() - started)
+            with lock:
+                latencies[name].append(elapsed)
+                errors[name] += not ok
+
+    threads = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(workers)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    started = time.perf_counter()
+    window["deadline"] = started + seconds
+    go.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    if len(failed_logins) == workers:
+        raise SystemExit(f"No worker could log in ({failed_logins[0]}); seed the database first")
+
+    operations = {}
+    for name in names:
+        summary = common.latency_summary(latencies[name])
+        summary["errors"] = errors[name]
+        summary["requests_per_second"] = round(len(latencies[name]) / elapsed, 1)
+        operations[name] = summary
+    everything = [sample for samples in latencies.values() for sample in samples]
+    overall = common.latency_summary(everything)
+    overall["errors"] = sum(errors.values())
+    overall["requests_per_second"] = round(len(everything) / elapsed, 1)
+    return {"elapsed_seconds": round(elapsed, 2), "failed_logins": failed_logins,
+            "overall": overall, "operations": operations}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"operation=weight pairs (default {DEFAULT_MIX})")
+    parser.add_argument("--users", type=int, default=100, help="seeded users the workers log in as")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the operation sequence")
+    parser.add_argument("--url", help="drive a running server instead of an in-process app")
+    parser.add_argument("--mongomock", action="store_true", help="seed and use an in-process mongomock")
+    parser.add_argument("--expenses", type=int, default=100, help="expenses per user to seed with --mongomock")
+    parser.add_argument("--output", help="write the JSON result here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.url and args.mongomock:
+        parser.error("--mongomock only applies to the in-process app")
+    if args.mongomock:
+        common.use_mongomock()
+        seed(args.users, args.expenses)
+
+    if args.url:
+        make_client = lambda: HttpClient(args.url)
+    else:
+        from backend.factory import create_app
+        app = create_app()
+        make_client = lambda: InProcessClient(app)
+
+    result = run(make_client, args.workers, args.seconds, args.mix, args.users, args.seed)
+    result.update({
+        "target": args.url or "in-process",
+        "workers": args.workers,
+        "mix": args.mix,
+        "seed": args.seed,
+    })
+    common.write_result("load", result, args.output)
+
+
+if __name__ == "__main__":
+    main()
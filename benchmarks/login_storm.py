@@ -0,0 +1,143 @@
+"""Login throughput against concurrent expense reads.
+
+Login threads hammer POST /api/login while reader threads page through
+GET /api/expenses/<email> with a valid token, all through the test client
+of one app. Run it once with the hashing pool and once with --inline to see
+how much the readers' latency suffers when hashing runs on request threads.
+
+    python -m benchmarks.login_storm --seconds 10 --logins 16 --readers 4
+    python -m benchmarks.login_storm --inline --output inline.json
+"""
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_DB", "login_storm_bench")
+os.environ["ENSURE_INDEXES_ON_STARTUP"] = "false"
+
+from backend import passwords
+from backend.config import Config
+from backend.database import users_collection, expenses_collection
+from backend.factory import create_app
+
+PASSWORD = "correct horse battery staple"
+READER_EMAIL = "reader@example.com"
+
+
+def seed(users, expenses):
+    """``users`` login accounts sharing one hash, and a reader with ``expenses`` rows."""
+    stored = passwords.hash_password(PASSWORD)
+    accounts = [{"username": f"user{i}", "email": f"user{i}@example.com", "password": stored} for i in range(users)]
+    accounts.append({"username": "reader", "email": READER_EMAIL, "password": stored})
+    users_collection.delete_many({"email": {"$in": [a["email"] for a in accounts]}})
+    expenses_collection.delete_many({"user_id": READER_EMAIL})
+    users_collection.insert_many(accounts)
+    start = datetime.now(timezone.utc)
+    expenses_collection.insert_many([
+        {"user_id": READER_EMAIL, "amount": 1.0 + i % 50, "category": "bench",
+         "description": f"Expense {i}", "created_at": start - timedelta(seconds=i)}
+        for i in range(expenses)
+    ])
+
+
+def percentile(samples, p):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))], 2)
+
+
+def run(app, seconds, logins, readers, users):
+    client = app.test_client()
+    token = client.post("/api/login", json={"email": READER_EMAIL, "password": PASSWORD}).get_json()["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    deadline = time.perf_counter() + seconds
+    lock = threading.Lock()
+    counts = {"logins": 0, "busy": 0, "login_errors": 0, "reads": 0}
+    read_ms = []
+
+    def login_loop(n):
+        client = app.test_client()
+        i = n
+        while time.perf_counter() < deadline:
+            response = client.post("/api/login", json={"email": f"user{i % users}@example.com", "password": PASSWORD})
+            key = {200: "logins", 503: "busy"}.get(response.status_code, "login_errors")
+            with lock:
+                counts[key] += 1
+            i += logins
+
+    def read_loop():
+        client = app.test_client()
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = client.get(f"/api/expenses/{READER_EMAIL}?limit=50", headers=headers)
+            elapsed = 1000 * (time.perf_counter() - started)
+            assert response.status_code == 200, response.status_code
+            with lock:
+                counts["reads"] += 1
+                read_ms.append(elapsed)
+
+    threads = [threading.Thread(target=login_loop, args=(n,)) for n in range(logins)]
+    threads += [threading.Thread(target=read_loop) for _ in range(readers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "seconds": round(elapsed, 2),
+        "logins_per_second": round(counts["logins"] / elapsed, 1),
+        "rejected_503": counts["busy"],
+        "login_errors": counts["login_errors"],
+        "reads_per_second": round(counts["reads"] / elapsed, 1),
+        "read_ms": {
+            "p50": percentile(read_ms, 50),
+            "p95": percentile(read_ms, 95),
+            "p99": percentile(read_ms, 99),
+            "mean": round(statistics.fmean(read_ms), 2) if read_ms else None,
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--logins", type=int, default=16, help="concurrent login threads")
+    parser.add_argument("--readers", type=int, default=4, help="concurrent expense-read threads")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--expenses", type=int, default=500)
+    parser.add_argument("--inline", action="store_true", help="hash on the request threads (no pool)")
+    parser.add_argument("--output", help="write the JSON result here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.inline:
+        Config.PASSWORD_POOL_WORKERS = 0
+    seed(args.users, args.expenses)
+    result = run(create_app(), args.seconds, args.logins, args.readers, args.users)
+    result.update({
+        "mode": "inline" if args.inline else "pool",
+        "hash_method": Config.PASSWORD_HASH_METHOD,
+        "pool_workers": Config.PASSWORD_POOL_WORKERS,
+        "pool_max_pending": Config.PASSWORD_POOL_MAX_PENDING,
+        "login_threads": args.logins,
+        "reader_threads": args.readers,
+    })
+    passwords.shutdown()
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
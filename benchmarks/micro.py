@@ -0,0 +1,116 @@
+"""Micro-benchmarks for hot functions on the request path.
+
+Each case is called in a tight loop for about --seconds and reports calls
+per second and per-call latency percentiles. Cases:
+
+- jwt: ``decode_jwt`` (full HS256 check) vs. ``verify_token`` (cached)
+- serialization: one listing page of ExpenseModels and the raw documents
+  through the JSON provider, and ``ExpenseModel.from_doc``
+- budget: ``ledger.tally`` (the aggregate over a user's expenses) vs.
+  reading the running counters, and ``analytics.summarize``
+
+The budget cases need data: seed first with ``benchmarks.seed`` or pass
+--mongomock to seed an in-process database.
+
+    python -m benchmarks.micro --cases jwt serialization
+    python -m benchmarks.micro --mongomock --expenses 2000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks import common  # first: points backend at the benchmark database
+
+import jwt
+from bson.objectid import ObjectId
+
+from backend import analytics, ledger, serialization
+from backend.auth import SECRET_KEY, decode_jwt, verify_token
+from backend.database import budgets_collection
+from backend.models import ExpenseModel
+from benchmarks.seed import bench_email, seed
+
+PAGE_SIZE = 50
+
+
+def measure(fn, seconds):
+    """Call ``fn`` repeatedly for about ``seconds`` and summarize the timings."""
+    samples = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        fn()
+        samples.append(1000 * (time.perf_counter() - started))
+    summary = common.latency_summary(samples)
+    summary["calls_per_second"] = round(len(samples) / (sum(samples) / 1000), 1)
+    return summary
+
+
+def jwt_cases():
+    token = jwt.encode(
+        {"user_id": str(ObjectId()), "email": bench_email(0),
+         "exp": datetime.now(timezone.utc) + timedelta(hours=1)},
+        SECRET_KEY, algorithm="HS256",
+    )
+    verify_token(token)
+    return {
+        "decode_jwt": lambda: decode_jwt(token),
+        "verify_token_cached": lambda: verify_token(token),
+    }
+
+
+def serialization_cases():
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    docs = [
+        {"_id": ObjectId(), "user_id": bench_email(0), "amount": i + 0.99, "category": "food",
+         "description": f"Expense {i}", "created_at": start + timedelta(minutes=i)}
+        for i in range(PAGE_SIZE)
+    ]
+    models = [ExpenseModel.from_doc(doc) for doc in docs]
+    return {
+        f"encode_page_{PAGE_SIZE}_models": lambda: serialization.dumps_bytes({"expenses": models}),
+        f"encode_page_{PAGE_SIZE}_docs": lambda: serialization.dumps_bytes({"expenses": docs}),
+        f"from_doc_x{PAGE_SIZE}": lambda: [ExpenseModel.from_doc(doc) for doc in docs],
+    }
+
+
+def budget_cases():
+    email = bench_email(0)
+    if not budgets_collection.find_one({"email": email}, {"_id": 1}):
+        raise SystemExit("No benchmark data: run python -m benchmarks.seed first, or pass --mongomock")
+    return {
+        "ledger_tally_aggregate": lambda: ledger.tally(email),
+        "ledger_counters_read": lambda: budgets_collection.find_one(
+            {"email": email, "is_active": True}, {"spent": 1, "expense_count": 1}),
+        "analytics_summarize": lambda: analytics.summarize(email, None, None, "month", 5),
+    }
+
+
+CASES = {
+    "jwt": jwt_cases,
+    "serialization": serialization_cases,
+    "budget": budget_cases,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=sorted(CASES))
+    parser.add_argument("--seconds", type=float, default=2.0, help="time spent on each case")
+    parser.add_argument("--mongomock", action="store_true", help="seed and use an in-process mongomock")
+    parser.add_argument("--expenses", type=int, default=1000, help="expenses to seed with --mongomock")
+    parser.add_argument("--output", help="write the JSON result here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.mongomock:
+        common.use_mongomock()
+        seed(1, args.expenses)
+
+    results = {}
+    for group in args.cases:
+        results[group] = {name: measure(fn, args.seconds) for name, fn in CASES[group]().items()}
+    common.write_result("micro", {"seconds_per_case": args.seconds, "results": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
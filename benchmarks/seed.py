@@ -0,0 +1,117 @@
+"""Generate synthetic users, budgets and expenses for benchmarking.
+
+Users are bench0@example.com .. bench{N-1}@example.com, all with the
+password BENCH_PASSWORD, each with an active budget whose counters match
+their M expenses. Expenses are spread over the past year across a handful
+of categories. The same --seed always produces the same amounts,
+categories and dates (relative to when it runs). Expenses are written in
+the EXPENSE_STORAGE layout.
+
+    python -m benchmarks.seed --users 100 --expenses 1000 --drop
+    python -m benchmarks.seed --mongomock --users 10 --expenses 100
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks import common  # first: points backend at the benchmark database
+
+from werkzeug.security import generate_password_hash
+
+from backend import repository
+from backend.config import Config
+from backend.database import budgets_collection, buckets_collection, expenses_collection, users_collection
+from backend.indexes import ensure_indexes
+from backend.models import BudgetModel, ExpenseBatch, UserModel
+
+BENCH_PASSWORD = "bench-password"
+CATEGORIES = ("food", "rent", "transport", "utilities", "fun", "health", "travel", "shopping")
+INSERT_BATCH_SIZE = 10000
+# Large enough that load runs never hit the limit
+BUDGET_AMOUNT = 1e12
+
+
+def bench_email(i):
+    return f"bench{i}@example.com"
+
+
+def seed(users, expenses, seed=0, drop=False):
+    """Insert the data set and return counts and timings.
+
+    One password hash, made with the configured method, is shared by every
+    user so seeding is not dominated by hashing.
+    """
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    if drop:
+        for collection in (users_collection, expenses_collection, buckets_collection, budgets_collection):
+            collection.drop()
+    ensure_indexes()
+
+    password = generate_password_hash(BENCH_PASSWORD, method=Config.PASSWORD_HASH_METHOD)
+    now = datetime.now(timezone.utc)
+    year = timedelta(days=365).total_seconds()
+
+    emails = [bench_email(i) for i in range(users)]
+    users_collection.delete_many({"email": {"$in": emails}})
+    budgets_collection.delete_many({"email": {"$in": emails}})
+    expenses_collection.delete_many({"user_id": {"$in": emails}})
+    buckets_collection.delete_many({"user_id": {"$in": emails}})
+    repo = repository.get()
+
+    users_collection.insert_many([UserModel(f"bench{i}", email, password).to_doc() for i, email in enumerate(emails)])
+
+    budgets = []
+    pending = []
+    inserted = 0
+    for email in emails:
+        batch = ExpenseBatch(email)
+        for n in range(expenses):
+            batch.append(
+                round(rng.uniform(1, 200), 2),
+                rng.choice(CATEGORIES),
+                f"Synthetic expense {n}",
+                (now - timedelta(seconds=rng.uniform(0, year))).timestamp(),
+            )
+        pending.extend(batch.to_docs())
+        if len(pending) >= INSERT_BATCH_SIZE:
+            inserted += len(repo.insert_many(pending))
+            pending = []
+        budgets.append(BudgetModel(email, BUDGET_AMOUNT, spent=batch.total(), expense_count=len(batch),
+                                   created_at=now, updated_at=now).to_doc())
+    if pending:
+        inserted += len(repo.insert_many(pending))
+    if budgets:
+        budgets_collection.insert_many(budgets)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "users": users,
+        "expenses_per_user": expenses,
+        "expenses_inserted": inserted,
+        "seed": seed,
+        "storage": repo.name,
+        "elapsed_seconds": round(elapsed, 3),
+        "expenses_per_second": round(inserted / elapsed, 1) if elapsed else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--expenses", type=int, default=1000, help="expenses per user")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for reproducible data")
+    parser.add_argument("--drop", action="store_true", help="drop the users, expenses and budgets collections first")
+    parser.add_argument("--mongomock", action="store_true", help="seed an in-process mongomock (mostly for trying it out)")
+    parser.add_argument("--output", help="write the JSON result here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.mongomock:
+        common.use_mongomock()
+    result = seed(args.users, args.expenses, seed=args.seed, drop=args.drop)
+    common.write_result("seed", result, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Measure cold start: interpreter launch through the first 200 response.
+
+Every run is a fresh interpreter that imports the factory, builds the app
+and serves GET /health through the test client. Phase timings come from
+inside the child; the total is wall time seen by the parent.
+
+    python -m benchmarks.startup --runs 10 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+CHILD = r"""
+import json, time
+started = time.perf_counter()
+from backend.factory import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+response = app.test_client().get(PATH)
+served = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({
+    "import_ms": 1000 * (imported - started),
+    "create_app_ms": 1000 * (created - imported),
+    "first_request_ms": 1000 * (served - created),
+}))
+"""
+
+
+def run_once(path, env):
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD.replace("PATH", repr(path))],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    total_ms = 1000 * (time.perf_counter() - started)
+    phases = json.loads(output.strip().splitlines()[-1])
+    phases["total_ms"] = total_ms
+    return phases
+
+
+def summarize(samples):
+    return {
+        key: {
+            "min": round(min(s[key] for s in samples), 2),
+            "median": round(statistics.median(s[key] for s in samples), 2),
+            "max": round(max(s[key] for s in samples), 2),
+        }
+        for key in samples[0]
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--path", default="/health", help="first request to serve")
+    parser.add_argument("--with-indexes", action="store_true",
+                        help="let the first request create indexes (needs MongoDB)")
+    parser.add_argument("--output", help="write the JSON result here instead of stdout")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ)
+    env.setdefault("MONGO_URI", "mongodb://localhost:27017")
+    env["ENSURE_INDEXES_ON_STARTUP"] = "true" if args.with_indexes else "false"
+
+    samples = [run_once(args.path, env) for _ in range(args.runs)]
+    result = {"runs": args.runs, "path": args.path, "phases": summarize(samples), "samples": samples}
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
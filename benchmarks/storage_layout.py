@@ -0,0 +1,109 @@
+"""Read and write cost of the two expense layouts: documents vs. monthly buckets.
+
+For each layout, --expenses expenses spread over the past --months months
+are written one at a time through the layout's repository, timing each
+insert. Then --reads rounds of the reads the API issues are timed:
+the first listing page, one whole month of history, one month's totals and
+all-time totals. The MongoDB documents each layout needs for the user are
+reported too, with collection and index sizes when the server reports them.
+The data is deleted afterwards.
+
+    python -m benchmarks.storage_layout --expenses 20000 --months 24
+    python -m benchmarks.storage_layout --mongomock --expenses 2000 --output layouts.json
+"""
+import argparse
+import random
+from datetime import datetime, timedelta, timezone
+
+from benchmarks import common  # first: points backend at the benchmark database
+
+from pymongo.errors import OperationFailure
+
+from backend import purge, repository
+from backend.database import db
+from backend.models import ExpenseModel
+
+CATEGORIES = ("food", "rent", "transport", "utilities", "fun")
+# What the listing route reads for its first page
+PAGE_SIZE = 50
+
+
+def _email(layout):
+    return f"layout-bench-{layout}@example.com"
+
+
+def _sizes(collection):
+    try:
+        stats = db.command({"collStats": collection})
+    except (OperationFailure, NotImplementedError):
+        return None
+    return {"size_bytes": stats.get("size"), "index_bytes": stats.get("totalIndexSize")}
+
+
+def run(layout, expenses, months, reads, seed):
+    repo = repository.get(layout)
+    email = _email(layout)
+    match = purge.live(email, 0)
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    span = timedelta(days=30 * months).total_seconds()
+
+    insert_ms = []
+    for n in range(expenses):
+        doc = ExpenseModel(email, round(rng.uniform(1, 200), 2), rng.choice(CATEGORIES), f"Expense {n}",
+                           created_at=now - timedelta(seconds=rng.uniform(0, span))).to_doc()
+        _, elapsed = common.timed(repo.insert, doc)
+        insert_ms.append(elapsed)
+
+    month_starts = [repository.month_of(now - timedelta(days=30 * m)) for m in range(months)]
+    samples = {"list_first_page": [], "month_history": [], "month_totals": [], "all_time_totals": []}
+    for _ in range(reads):
+        month = rng.choice(month_starts)
+        end = repository.next_month(month)
+        samples["list_first_page"].append(common.timed(
+            lambda: list(repo.find(match, ExpenseModel.FIELDS, descending=True, limit=PAGE_SIZE + 1)))[1])
+        samples["month_history"].append(common.timed(
+            lambda: list(repo.find(match, ExpenseModel.FIELDS, month, end)))[1])
+        samples["month_totals"].append(common.timed(repo.totals, match, month, end)[1])
+        samples["all_time_totals"].append(common.timed(repo.totals, match)[1])
+
+    return {
+        "inserts": common.latency_summary(insert_ms),
+        "reads": {name: common.latency_summary(ms) for name, ms in samples.items()},
+        "documents": repo.collection.count_documents({"user_id": email}),
+        "collection": _sizes(repo.collection.name),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--expenses", type=int, default=5000)
+    parser.add_argument("--months", type=int, default=12, help="how far back the expenses go")
+    parser.add_argument("--reads", type=int, default=100, help="rounds of reads per layout")
+    parser.add_argument("--layouts", nargs="+", choices=list(repository.LAYOUTS), default=list(repository.LAYOUTS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mongomock", action="store_true", help="use an in-process mongomock")
+    parser.add_argument("--output", help="write the JSON result here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.mongomock:
+        common.use_mongomock()
+
+    results = {}
+    try:
+        for layout in args.layouts:
+            results[layout] = run(layout, args.expenses, args.months, args.reads, args.seed)
+    finally:
+        for layout in args.layouts:
+            repository.get(layout).collection.delete_many({"user_id": _email(layout)})
+    common.write_result("storage_layout", {
+        "expenses": args.expenses,
+        "months": args.months,
+        "reads": args.reads,
+        "bucket_max_expenses": repository.get("buckets").max_expenses,
+        "results": results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()